@@ -1,9 +1,11 @@
 # import test to run
 from Tests.Comparison import compare_methods
 from Tests.ComparisonTFWR  import compare_methods_tfrw
+from Tests.ComparisonPaired import compare_methods_paired
+from Tests.SimulationLoopBatch import validate_Loop_batch
 
 # import methods to test
-
+from GridSolvers.Templates import SolverSpec
 from GridSolvers.Loop import GridSolver_Loop
 from GridSolvers.LoopAndSkip import GridSolver_LoopAndSkip
 from GridSolvers.AsymDive import GridSolver_AsymDive
@@ -18,14 +20,37 @@ n = 32
 # choose number of games to run per solver
 N = 1000
 
+# or choose a relative precision of the mean score, to run only as many games as needed,
+# with N games and max_time seconds per solver as budgets
+target = None
+max_time = None
+
+# choose number of worker processes, None to run on a single core
+# and a master seed, None for a random one
+workers = None
+seed = None
+
+# choose a directory to save progress in, an interrupted run resumes from it
+checkpoint_dir = None
+
+# choose the fraction of games whose moves are checked, for solvers certified not to fail
+check_fraction = 1
+
 # initialise solvers
+# as specs, so that each worker process can rebuild them
 solvers = [
-    GridSolver_Loop(m, n),
-    GridSolver_LoopAndSkip(m, n),
-    GridSolver_AsymDive(m, n),
-    GridSolver_DronesRules_TransitionHC(m, n),
-    GridSolver_SPF_AOW_TransitionHC(m, n)
+    SolverSpec(GridSolver_Loop, m, n),
+    SolverSpec(GridSolver_LoopAndSkip, m, n),
+    SolverSpec(GridSolver_AsymDive, m, n),
+    SolverSpec(GridSolver_DronesRules_TransitionHC, m, n),
+    SolverSpec(GridSolver_SPF_AOW_TransitionHC, m, n)
 ]
 
-compare_methods(m, n, N, solvers, plot_estimates=False)
-#compare_methods_tfrw(m, n, N, solvers)
\ No newline at end of file
+# the guard is needed for worker processes started by spawning
+if __name__ == '__main__':
+    compare_methods(m, n, N, solvers, plot_estimates=False, workers=workers, seed=seed, checkpoint_dir=checkpoint_dir,
+                    target=target, max_time=max_time, check_fraction=check_fraction)
+    #compare_methods_tfrw(m, n, N, solvers, workers=workers, seed=seed, checkpoint_dir=checkpoint_dir,
+    #                     target=target, max_time=max_time)
+    #compare_methods_paired(m, n, N, solvers, corpus_path=f'apples_{m}x{n}_{N}.npy', seed=seed, workers=workers)
+    #validate_Loop_batch(m, n, N, seed=seed)
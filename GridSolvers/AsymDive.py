@@ -1,4 +1,6 @@
-from GridsAndGraphs.DiveCycle import asym_dive_cycle_even
+from GridsAndGraphs.DiveCycle import DiveCycle
+from GridsAndGraphs.SnakeBody import SnakeBody
+from GridSolvers.Templates import SafetyCertificate
 
 class GridSolver_AsymDive():
     def __init__(self, m, n, cutoff_length=None):
@@ -14,6 +16,10 @@ class GridSolver_AsymDive():
         self.area = m * n
         self.cutoff_length = cutoff_length or (3 * self.area) // 5
         self.loop = None
+        self.dive_cycle = DiveCycle(m, n)
+        self.snake = SnakeBody(self.area)
+        # each path follows a Hamiltonian cycle through the snake, chosen anew for each apple
+        self.safety_certificate = SafetyCertificate('cycle')
 
     def yield_moves_to_simulator(self, start):
         self.start_new_game(start)
@@ -22,7 +28,7 @@ class GridSolver_AsymDive():
 
     def start_new_game_even(self, start):
         self.snake_length = 1
-        self.snake = [start]
+        self.snake.start(start)
         self.head = start
         self.head_coord = divmod(start, self.n)
         self.left_dives = [0]*(self.m//2-1)
@@ -48,20 +54,13 @@ class GridSolver_AsymDive():
                         self.right_dives[i] = self.n - self.left_dives[i] - 2
                 self.new_loop = False
 
-            self.loop = asym_dive_cycle_even(self.n, self.left_dives, self.right_dives)
-            self.idx_head = self.loop.index(self.head)
-            self.idx_bottom_right = 2*sum(self.left_dives) + self.m + self.n -3
+            # only the dives which changed are patched
+            self.loop = self.dive_cycle
+            self.loop.set_dives(self.left_dives, self.right_dives)
 
-        beg = self.idx_head+1
-        idx_apple = self.loop.index(apple)
-        end = idx_apple+1
-        if beg < end:
-            path = self.loop[beg:end]
-        else:
-            path = self.loop[beg:]+self.loop[:end]
+        path = self.loop.find_path(self.head, apple)
 
         self.update_snake(path)
-        self.idx_head = idx_apple
         return path
 
     def update_snake(self, path):
@@ -69,14 +68,7 @@ class GridSolver_AsymDive():
         self.head = path[-1]
         self.head_coord = divmod(path[-1], self.n)
 
-        p = len(path)
-        if self.snake_length <= p:
-            # Tail is entirely in path
-            self.snake = path[-self.snake_length:]
-        else:
-            # Tail includes all of path + last part of snake
-            need_from_snake = self.snake_length - p
-            self.snake = self.snake[-need_from_snake:] + path
+        self.snake.move_along(path)
 
     def update_side(self):
         # if the snake lies on a single line, the side does not matter
@@ -100,9 +92,9 @@ class GridSolver_AsymDive():
                 self.is_left = None
                 return
         
-        # otherwise, we just have to compare the index of the head 
-        # to the index of the bottom right corner in the loop
-        self.is_left = self.idx_head<=self.idx_bottom_right
+        # otherwise, we just have to check whether the head comes
+        # before the bottom right corner in the loop
+        self.is_left = self.loop.is_left_side(self.head)
     
     def decide_dive_lengths(self, apple_coords):
         """ Based on the position of the snake and the apple, find a good dive cycle to get to the apple quickly """
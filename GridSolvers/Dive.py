@@ -1,4 +1,6 @@
-from GridsAndGraphs.DiveCycle import dive_cycle_even
+from GridsAndGraphs.DiveCycle import DiveCycle
+from GridsAndGraphs.SnakeBody import SnakeBody
+from GridSolvers.Templates import SafetyCertificate
 
 class GridSolver_Dive():
     def __init__(self, m, n):
@@ -13,6 +15,10 @@ class GridSolver_Dive():
         self.n = n
         self.area = m * n
         self.loop = None
+        self.dive_cycle = DiveCycle(m, n)
+        self.snake = SnakeBody(self.area)
+        # each path follows a Hamiltonian cycle through the snake, chosen anew for each apple
+        self.safety_certificate = SafetyCertificate('cycle')
 
     def yield_moves_to_simulator(self, start):
         self.start_new_game(start)
@@ -21,7 +27,7 @@ class GridSolver_Dive():
 
     def start_new_game_even(self, start):
         self.snake_length = 1
-        self.snake = [start]
+        self.snake.start(start)
         self.head = divmod(start, self.n)
         self.dive_lengths = [None]*(self.m//2-1)
         self.is_left = None
@@ -34,23 +40,16 @@ class GridSolver_Dive():
                 self.is_left = apple>self.snake[-1]
 
             dive_lengths = self.decide_dive_lengths(apple)
-            self.loop = dive_cycle_even(self.n, dive_lengths)
-            self.idx_head = self.loop.index(self.snake[-1])
-            self.idx_bottom_right = 2*sum(dive_lengths) + self.m + self.n -3
+            # only the dives which changed are patched
+            self.loop = self.dive_cycle
+            self.loop.set_dives(dive_lengths)
         else:
             # No degree of freedom, use the same loop as before
             dive_lengths = self.dive_lengths
 
-        beg = self.idx_head+1
-        idx_apple = self.loop.index(apple)
-        end = idx_apple+1
-        if beg < end:
-            path = self.loop[beg:end]
-        else:
-            path = self.loop[beg:]+self.loop[:end]
+        path = self.loop.find_path(self.snake[-1], apple)
 
         self.update_snake(path)
-        self.idx_head = idx_apple
         self.update_side()
         self.update_dive_lengths(dive_lengths)
         return path
@@ -59,14 +58,7 @@ class GridSolver_Dive():
         self.snake_length += 1
         self.head = divmod(path[-1], self.n)
 
-        p = len(path)
-        if self.snake_length <= p:
-            # Tail is entirely in path
-            self.snake = path[-self.snake_length:]
-        else:
-            # Tail includes all of path + last part of snake
-            need_from_snake = self.snake_length - p
-            self.snake = self.snake[-need_from_snake:] + path
+        self.snake.move_along(path)
 
     def update_side(self):
         head_x, head_y = self.head
@@ -90,9 +82,9 @@ class GridSolver_Dive():
                 self.is_left = None
                 return
         
-        # otherwise, we just have to compare the index of the head 
-        # to the index of the bottom right corner in the loop
-        self.is_left = self.idx_head<=self.idx_bottom_right
+        # otherwise, we just have to check whether the head comes
+        # before the bottom right corner in the loop
+        self.is_left = self.loop.is_left_side(self.snake[-1])
     
     def decide_dive_lengths(self, apple):
         """ Based on the position of the snake and the apple, find a good dive cycle to get to the apple quickly """
@@ -1,66 +1,69 @@
-from GridSolvers.Templates import GridSolverTemplate, ModifySolver_TransitionHC
+import numpy as np
+from GridSolvers.Templates import GridSolverTemplate, ModifySolver_TransitionHC, SafetyCertificate
 from GridsAndGraphs.Adjacencies import find_adjacency_AOW
 
 class GridSolver_DronesRules(GridSolverTemplate):
+    shares_board = False
+
     def __init__(self, m, n, name='Drone\'s Rules'):
         super().__init__(m, n, find_adjacency=find_adjacency_AOW, name=name)
+        self.safety_certificate = SafetyCertificate('subgraph', self.adjacency)
+        # the rules below as a table, indexed by 4*(i odd) + 2*(j odd) + (the apple is the way the rule checks)
+        i_vector, j_vector = n, 1
+        self.first_vectors  = np.array([ i_vector, -j_vector, -j_vector, -i_vector,
+                                         j_vector,  i_vector, -i_vector,  j_vector])
+        self.second_vectors = np.array([-j_vector,  i_vector, -i_vector, -j_vector,
+                                         i_vector,  j_vector,  j_vector, -i_vector])
+
+        # the same table compiled per cell, for find_and_commit_moves:
+        # the rule at each cell compares the apple's signed_targets[compared_keys[cell]] with thresholds[cell],
+        # and its choices, on the apple being the way the rule checks or not, are the new heads at 2*cell + that
+        i, j = np.divmod(np.arange(self.area), n)
+        i_odd = i & 1
+        j_odd = j & 1
+        compare_j = i_odd == j_odd
+        # the apple is the way the rule checks when its coordinate is below the head's for even i, above for odd i
+        self.compared_keys = (2*compare_j + i_odd).tolist()
+        self.thresholds = (np.where(compare_j, j, i) * np.where(i_odd, 1, -1)).tolist()
+        rules = (4*i_odd + 2*j_odd)[:, None] + np.arange(2)
+        heads = np.arange(self.area)[:, None]
+        self.first_heads = (heads + self.first_vectors[rules]).reshape(-1).tolist()
+        self.second_heads = (heads + self.second_vectors[rules]).reshape(-1).tolist()
+
+    def find_choices_batch(self, heads, apples):
+        # the first and second choices of the rules for many games at once, for the batch simulator
+        n = self.n
+        i, j = np.divmod(heads, n)
+        target_i, target_j = np.divmod(apples, n)
+        i_odd = i & 1
+        j_odd = j & 1
+        # the rule compares j when i and j have the same parity, i otherwise,
+        # and checks whether the apple is behind when i is even, ahead when i is odd
+        delta = np.where(i_odd == j_odd, target_j - j, target_i - i)
+        towards = np.where(i_odd, delta > 0, delta < 0)
+        rule = 4*i_odd + 2*j_odd + towards
+        return heads + self.first_vectors[rule], heads + self.second_vectors[rule]
 
     def find_and_commit_moves(self):
         carved_path = self.carved_path
-        n = self.n
+        compared_keys = self.compared_keys
+        thresholds = self.thresholds
+        first_heads = self.first_heads
+        second_heads = self.second_heads
 
         tail = self.tail
         head = self.head
         apple = self.apple
 
-        i_vector, j_vector = n, 1
-        target_i, target_j = divmod(apple, n)
-        i, j = divmod(head, n)
-        i_even = i%2 == 0
-        j_even = j%2 == 0
+        target_i, target_j = divmod(apple, self.n)
+        signed_targets = (-target_i, target_i, -target_j, target_j)
 
         while True:
-            # select the first and second choice vectors by Drone's Rules
-            if i_even:
-                if j_even:
-                    if target_j < j:
-                        first_vector  = -j_vector
-                        second_vector =  i_vector 
-                    else:
-                        first_vector  =  i_vector
-                        second_vector = -j_vector 
-                else:
-                    if target_i < i:
-                        first_vector  = -i_vector
-                        second_vector = -j_vector
-                    else:
-                        first_vector  = -j_vector
-                        second_vector = -i_vector
-            else:
-                if j_even:
-                    if target_i > i:
-                        first_vector  =  i_vector
-                        second_vector =  j_vector
-                    else:
-                        first_vector  =  j_vector
-                        second_vector =  i_vector
-                else:
-                    if target_j > j:
-                        first_vector  =  j_vector
-                        second_vector = -i_vector
-                    else:
-                        first_vector  = -i_vector
-                        second_vector =  j_vector
-
-            # prioritising the first choice over the second, choose a legal direction
-            first_new_head = head + first_vector
-            if carved_path[first_new_head] is None or first_new_head == tail:
-                direction = first_vector
-                new_head = first_new_head  
-            else:
-                # first direction is a collision
-                direction = second_vector
-                new_head = head + second_vector                   
+            # the rule at head, then its first choice unless that is a collision
+            choice = 2*head + (signed_targets[compared_keys[head]] > thresholds[head])
+            new_head = first_heads[choice]
+            if carved_path[new_head] is not None and new_head != tail:
+                new_head = second_heads[choice]
 
             # exit if apple was hit
             if new_head == apple:
@@ -68,32 +71,15 @@ class GridSolver_DronesRules(GridSolverTemplate):
                 self.tail = tail
                 self.head = apple
                 yield apple
-                return           
-
-            # update coordinates
-            if direction == i_vector:
-                i += 1
-                i_even = not i_even
-            elif direction == -i_vector:
-                i -= 1
-                i_even = not i_even
-            elif direction == j_vector:
-                j += 1
-                j_even = not j_even
-            else:
-                j -= 1
-                j_even = not j_even
+                return
 
             # commit the move
-            carved_path[head] = new_head               
+            carved_path[head] = new_head
             head = new_head
             new_tail = carved_path[tail]
             carved_path[tail] = None
             tail = new_tail
             yield head
 
-        # since only certain transitions are allowed between the states
-        # this implementation *could* be slightly optimised
-
 cutoff_HC_guess = 0.62 # looks good on the 32x32 grid
 GridSolver_DronesRules_TransitionHC = ModifySolver_TransitionHC(GridSolver_DronesRules, cutoff_HC_guess)
\ No newline at end of file
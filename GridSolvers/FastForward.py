@@ -5,8 +5,9 @@ Implements the 'Fast Forward' technique. Uses a modified A* search to find a pat
 that ends up in the same position as the underlying method.
 """
 
-from GridsAndGraphs.Adjacencies import find_adjacency_grid, find_Manhattan_distance_func
-from GridsAndGraphs.Pathfinding import astar
+from GridsAndGraphs.Adjacencies import find_adjacency_grid
+from GridsAndGraphs.Pathfinding import astar, find_Manhattan_distance_func, PathfindingWorkspace
+from GridSolvers.Templates import SafetyCertificate
 
 class Optimizer_FastForward:
     def __init__(self, SolverClass, m, n, *args, end_FF=None, **kwargs):
@@ -16,11 +17,14 @@ class Optimizer_FastForward:
         # Avoid doing adjacency computation twice if possible
         self.adjacency = self.solver.adjacency if hasattr(self.solver, "adjacency") else find_adjacency_grid(m, n)
         self.ManhattanDistance = find_Manhattan_distance_func(n)
+        self.workspace = PathfindingWorkspace(m*n)
 
         self.end_FF = end_FF or m*n//2
+        if getattr(self.solver, 'safety_certificate', None) is not None:
+            # shortcuts avoid the snake and the end of the solver's own path, but leave its cycle
+            self.safety_certificate = SafetyCertificate('subgraph')
 
     def yield_moves_to_simulator(self, start):
-        self.start_new_game()
         self.start_new_game(start)
         while True:
             yield from self.find_path(self.apple)
@@ -35,8 +39,7 @@ class Optimizer_FastForward:
             self.find_path = self.solver.find_path
             return self.solver.find_path(apple)
         
-        snake = self.solver.snake.copy()
-        head = snake[-1]
+        head = self.solver.snake[-1]
 
         basic_path = list(self.solver.find_path(apple))
         if len(basic_path)<= l:
@@ -45,8 +48,11 @@ class Optimizer_FastForward:
         end_path = basic_path[len(basic_path)-l+1:]
 
         target = basic_path[-l]
-        blocked = set(snake).union(end_path)
-        head_to_target = astar(head, target, blocked, self.adjacency, self.ManhattanDistance, len(basic_path)-l)
+        # the snake before the path, which is only read here, when it is shorter than the path
+        blocked = set(self.solver.snake.find_previous_cells())
+        blocked.update(end_path)
+        head_to_target = astar(head, target, blocked, self.adjacency, self.ManhattanDistance, len(basic_path)-l,
+                               self.workspace)
 
         if head_to_target is None:
             return basic_path
@@ -4,6 +4,8 @@ Sticks to a Hamiltonian Cycle, unless the grid has odd area A,
 then it follows a spanning Theta(A-3, 2, 2) subgraph.
 """
 from GridsAndGraphs.CycleAndTheta import find_HC_haircomb, find_theta_haircomb
+from GridsAndGraphs.CycleAndTheta import find_followed_cycle_HC, find_followed_cycle_theta
+from GridSolvers.Templates import SafetyCertificate, find_successors_cycle
 
 class GridSolver_Loop():
     def __init__(self, m, n, find_HC = find_HC_haircomb, find_theta = find_theta_haircomb):
@@ -11,23 +13,33 @@ class GridSolver_Loop():
         exists_HC = m%2==0 or n%2==0
         if exists_HC:
             self.loop = find_HC(m, n)
+            self.followed_cycle = find_followed_cycle_HC(self.loop)
+            self.safety_certificate = SafetyCertificate('cycle', find_successors_cycle(self.loop))
             self.yield_moves_to_simulator = self.yield_moves_to_simulator_HC
         else:
             self.theta = find_theta(m, n)
+            self.followed_cycle = find_followed_cycle_theta(self.theta)
+            long_path, hole1, hole2 = self.theta
+            successors = find_successors_cycle(long_path + [hole1], m*n)
+            successors[long_path[-1]] = (hole1, hole2)
+            successors[hole2] = (long_path[0],)
+            self.safety_certificate = SafetyCertificate('cycle', successors)
             self.yield_moves_to_simulator = self.yield_moves_to_simulator_theta
 
     def yield_moves_to_simulator_HC(self, start):
-        loop = self.loop
-        yield from loop[loop.index(start)+1:]
+        # the rest of the lap, without searching or copying the loop
+        cycle = self.followed_cycle
+        yield from cycle.find_segment_after(start, cycle.lap - 1 - cycle.loop_indices[start])
         while True:
-            yield from loop
+            yield from cycle.view
 
     def yield_moves_to_simulator_theta(self, start):
         long_path, hole1, hole2 = self.theta
+        cycle = self.followed_cycle
         if start == hole1 or start == hole2:
             yield from long_path
         else:
-            yield from long_path[long_path.index(start)+1:]
+            yield from cycle.find_segment_after(start, len(long_path) - 1 - cycle.loop_indices[start])
         while True:
             yield hole2 if self.apple == hole2 else hole1
             yield from long_path
\ No newline at end of file
@@ -1,8 +1,40 @@
 from GridsAndGraphs.Adjacencies import find_adjacency_grid
-from GridsAndGraphs.CycleAndTheta import find_HC_haircomb, find_indices_HC, find_adjacent_indices_HC
+from GridsAndGraphs.CycleAndTheta import find_HC_haircomb, find_indices_HC, find_adjacent_indices_HC, find_followed_cycle_HC
+from GridSolvers.Templates import SafetyCertificate
 
-def greedy_skip(solver): 
-    neighbouring_loop_indices = solver.neighbouring_loop_indices
+def find_skip_table(neighbouring_loop_indices, area, stride=8):
+    """
+    The neighbouring loop indices of each index as one flat list, stride slots per index,
+    in the orders greedy_skip reads them.
+    A list rather than an int32 array, since each read from an array makes a new int, which is slower.
+    From stride*index, the neighbours in descending order:
+    the skip is the first not past a bound, the apple or the tail, as the successor index+1 never is.
+    From stride*index + stride//2, the neighbours as scores for skipping round the end of the loop,
+    index - area past the head, which are always taken, and index up to the head,
+    in reverse order up to the first past the head:
+    the skip is the first not past the first obstacle, min(tail, apple), taken modulo area.
+    Unused slots are never reached, since the successor ends each scan.
+    """
+    half = stride // 2
+    table = [-1] * (stride * area)
+    for index, neighbours in enumerate(neighbouring_loop_indices):
+        if len(neighbours) > half:
+            raise ValueError(f'Skip tables with stride {stride} take at most {half} neighbours')
+        table[stride*index:stride*index+len(neighbours)] = sorted(neighbours, reverse=True)
+        # the last neighbour which passes is taken, so they are stored in reverse
+        scores = []
+        for neighbour in reversed(neighbours):
+            if index < neighbour:
+                scores.append(neighbour - area)
+                break
+            scores.append(neighbour)
+        table[stride*index+half:stride*index+half+len(scores)] = scores
+    return table
+
+def greedy_skip(solver):
+    skip_table = solver.skip_table
+    stride = solver.skip_table_stride
+    half = stride // 2
     carved_path_index = solver.carved_path_index
     loop = solver.loop
     area = solver.area
@@ -13,40 +45,26 @@ def greedy_skip(solver):
 
     while True:
 
-        if index_head < index_apple:
-            best_new_index = index_head
-            for possible_new_index in neighbouring_loop_indices[index_head]:
-                if possible_new_index < best_new_index:
-                    continue
-                if index_apple < possible_new_index:
-                    continue
-                if index_head < index_tail < possible_new_index:
-                    continue 
-                best_new_index = possible_new_index
-
-        elif index_head < index_tail:
-            best_new_index = index_head
-            for possible_new_index in neighbouring_loop_indices[index_head]:
-                if possible_new_index < best_new_index:
-                    continue
-                if index_tail < possible_new_index:
-                    continue
-                best_new_index = possible_new_index
+        if index_head < index_apple or index_head < index_tail:
+            # the furthest skip not past the apple, nor the tail if it is ahead of the head
+            if index_head < index_tail < index_apple or index_apple <= index_head:
+                bound = index_tail
+            else:
+                bound = index_apple
+            i = stride * index_head
+            best_new_index = skip_table[i]
+            while best_new_index > bound:
+                i += 1
+                best_new_index = skip_table[i]
 
         else:
-            best_score = index_head - area
             first_obstacle = min(index_tail, index_apple)
-            for possible_new_index in neighbouring_loop_indices[index_head]:
-                if index_head < possible_new_index:
-                    score = possible_new_index - area
-                elif first_obstacle < possible_new_index:
-                    continue
-                else:
-                    score = possible_new_index
-            
-                if score <= best_score:
-                    continue
-                best_new_index = possible_new_index
+            i = stride * index_head + half
+            score = skip_table[i]
+            while score > first_obstacle:
+                i += 1
+                score = skip_table[i]
+            best_new_index = score % area
 
         # commit this move
         carved_path_index[index_head] = best_new_index 
@@ -58,8 +76,6 @@ def greedy_skip(solver):
         index_head = best_new_index 
         index_tail = carved_path_index[index_tail]
         yield loop[best_new_index]
-    # since only certain transitions are allowed between the states
-    # this implementation *could* be slightly optimised
 
 
 
@@ -70,12 +86,17 @@ class GridSolver_LoopAndSkip:
         self.adjacency = find_adjacency_grid(m, n)
         self.cutoff_length = cutoff_length if cutoff_length is not None else self.area // 2
         self.carved_path_index = [None] * self.area
+        # skips only ever land between the head and the tail along the loop
+        self.safety_certificate = SafetyCertificate('subgraph')
 
         exists_HC = m%2==0 or n%2==0
         if exists_HC:
             self.loop = find_HC(m, n)
             self.loop_indices = find_indices_HC(self.loop)
+            self.cycle = find_followed_cycle_HC(self.loop)
             self.neighbouring_loop_indices = find_adjacent_indices_HC(self.adjacency, self.loop, self.loop_indices)
+            self.skip_table_stride = 8
+            self.skip_table = find_skip_table(self.neighbouring_loop_indices, self.area, self.skip_table_stride)
             self.yield_moves_to_simulator = self.yield_moves_to_simulator_HC
             self.estimate_moves_per_apple = self.estimate_moves_per_apple_HC
             self.loop_and_skip = loop_and_skip
@@ -83,6 +104,7 @@ class GridSolver_LoopAndSkip:
             raise ValueError('Solver not implemented on odd-by-odd grids!')
             
     def yield_moves_to_simulator_HC(self, start):
+        self.followed_cycle = None
         index_start = self.loop_indices[start]
         self.index_head = index_start
         self.index_tail = index_start
@@ -90,10 +112,11 @@ class GridSolver_LoopAndSkip:
         for apples_eaten in range(self.cutoff_length):
             yield from self.loop_and_skip(self)
 
-        loop = self.loop
-        yield from loop[self.index_head+1:]
+        cycle = self.cycle
+        self.followed_cycle = cycle
+        yield from cycle.find_segment_after(self.loop[self.index_head], cycle.lap - 1 - self.index_head)
         while True:
-            yield from loop
+            yield from cycle.view
 
  
     def estimate_moves_per_apple_HC(self):
@@ -1,14 +1,46 @@
-from GridSolvers.Templates import GridSolverTemplate, ModifySolver_TransitionHC
+from GridSolvers.Templates import GridSolverTemplate, ModifySolver_TransitionHC, SafetyCertificate
 from GridsAndGraphs.Adjacencies import find_adjacency_AOW
-from GridsAndGraphs.Pathfinding import safe_path_finder_BFS, find_barrier_costs_from_carved_path
+from GridsAndGraphs.Pathfinding import safe_path_finder_BFS, safe_path_finder_astar, PathfindingWorkspace, TieredSafePathFinder
 
 class GridSolver_SPF_AOW(GridSolverTemplate):
-    def __init__(self, m, n, name='SPF AOW BFS'):
-        super().__init__(m, n, find_adjacency=find_adjacency_AOW, name=name)
+    def __init__(self, m, n, name='SPF AOW BFS', exact_heuristic=False):
+        super().__init__(m, n, find_adjacency=find_adjacency_AOW, name=name, exact_heuristic=exact_heuristic)
+        self.safety_certificate = SafetyCertificate('subgraph', self.adjacency)
+        self.workspace = PathfindingWorkspace(self.area)
 
     def find_moves(self):
-        barrier_costs = find_barrier_costs_from_carved_path(self.tail, self.head, self.carved_path)
-        return safe_path_finder_BFS(self.head, self.apple, barrier_costs, self.adjacency)
+        # a cell last entered on move t is left after move t + length, so is free after the first time - length + t moves
+        # the timeline then serves as barrier costs offset by time - length, in O(1) per move instead of O(length) per apple
+        return safe_path_finder_BFS(self.head, self.apple, self.last_occupied, self.adjacency, self.workspace,
+                                    self.time - self.length)
     
 best_HC_cutoff_constant = 0.62 # looks good on the 32x32 grid
-GridSolver_SPF_AOW_TransitionHC = ModifySolver_TransitionHC(GridSolver_SPF_AOW, best_HC_cutoff_constant)
\ No newline at end of file
+GridSolver_SPF_AOW_TransitionHC = ModifySolver_TransitionHC(GridSolver_SPF_AOW, best_HC_cutoff_constant)
+
+
+class GridSolver_SPF_AOW_AStar(GridSolver_SPF_AOW):
+    # with exact_heuristic, A* is guided by distances in the AOW graph rather than Manhattan distance
+    def __init__(self, m, n, name='SPF AOW A*', exact_heuristic=False):
+        super().__init__(m, n, name=name, exact_heuristic=exact_heuristic)
+
+    def find_moves(self):
+        heuristic = self.find_distance_heuristic_func(self.apple)
+        return safe_path_finder_astar(self.head, self.apple, self.last_occupied, self.adjacency, heuristic,
+                                      self.workspace, self.time - self.length, self.unreachable_distance)
+
+GridSolver_SPF_AOW_AStar_TransitionHC = ModifySolver_TransitionHC(GridSolver_SPF_AOW_AStar, best_HC_cutoff_constant)
+
+
+class GridSolver_SPF_AOW_Tiered(GridSolver_SPF_AOW):
+    # the BFS path, or a strictly shorter one if the exact search finds it within budget
+    # path_finder counts how often that happens, see TieredSafePathFinder.print_counts
+    def __init__(self, m, n, max_states=20000, max_seconds=None, name='SPF AOW Tiered'):
+        super().__init__(m, n, name=name)
+        self.path_finder = TieredSafePathFinder(self.area, max_states, max_seconds)
+        self.workspace = self.path_finder.workspace
+
+    def find_moves(self):
+        return self.path_finder.find_path(self.head, self.apple, self.last_occupied, self.adjacency,
+                                          self.time - self.length)
+
+GridSolver_SPF_AOW_Tiered_TransitionHC = ModifySolver_TransitionHC(GridSolver_SPF_AOW_Tiered, best_HC_cutoff_constant)
@@ -5,33 +5,67 @@
 
 # to use this, make a subclass with a method called self.find_moves
 # alternatively, self.find_and_commit_moves can be overwritten — see Drone's Rules
+# then set shares_board = False, as the solver must track the snake itself
 
 class GraphSolverTemplate:
+    # the simulator's Board is read instead of a copy of the snake, see Tests.Simulation
+    shares_board = True
+
     def __init__(self, adjacency, name=''):
         self.adjacency = adjacency
         self.name = name
         self.area = len(adjacency)
 
     def yield_moves_to_simulator(self, start):
+        self.start_snake(start)
+        while True:
+            yield from self.find_and_commit_moves()
+
+    def start_snake(self, start):
+        # the snake is tracked twice, as carved_path and as a timeline:
+        # last_occupied[cell] is the move on which the head last entered cell,
+        # which is in the snake while last_occupied[cell] > time - length
         self.carved_path = [None] * self.area
         self.head = start
         self.tail = start
-
+        self.time = 0
+        self.length = 1
+        self.last_occupied = [-1] * self.area
+        self.last_occupied[start] = 0
+
+    def yield_moves_on_board(self, board):
+        # the board is updated after every move, so find_moves sees the snake as it is
+        self.carved_path = board.carved_path
+        self.last_occupied = board.last_occupied
         while True:
-            yield from self.find_and_commit_moves()
+            self.head = board.head
+            self.tail = board.tail
+            self.time = board.time
+            self.length = board.length
+            apple = self.apple
+            for new_head in self.find_moves():
+                yield new_head
+                if new_head == apple:
+                    break
 
     def find_and_commit_moves(self):
         # intermediate step to centralise responsibilty of tracking the snake via carved_path
         carved_path = self.carved_path
+        last_occupied = self.last_occupied
         tail = self.tail
         head = self.head
+        time = self.time
         apple = self.apple 
         for new_head in self.find_moves():  
             carved_path[head] = new_head 
             head = new_head
+            time += 1
+            last_occupied[head] = time
             if new_head == apple:
                 self.tail = tail
                 self.head = apple
+                self.time = time
+                self.length += 1
                 yield apple   
                 return   
             new_tail = carved_path[tail]
@@ -44,26 +78,37 @@ class GraphSolverTemplate:
 
 # can quickly be built from the general graph template above
 # only important difference is the Manhattan distance, and the side-lengths for row-major ordering or whatnot
+# with exact_heuristic, the distance heuristic is instead the directed distance in the solver's own graph,
+# read from a distance table cached on disk, see GridsAndGraphs/DistanceTables.py
 
-from GridsAndGraphs.Pathfinding import find_Manhattan_heuristic2
+from GridsAndGraphs.Pathfinding import find_Manhattan_heuristic2, INF
+from GridsAndGraphs.DistanceTables import load_distance_table, find_distance_table_heuristic2, UNREACHABLE
 
 class GridSolverTemplate(GraphSolverTemplate):
-    def __init__(self, m, n, adjacency=None, find_adjacency=None,  name=''):
+    def __init__(self, m, n, adjacency=None, find_adjacency=None,  name='', exact_heuristic=False):
         self.m = m
         self.n = n
         self.find_distance_heuristic_func = find_Manhattan_heuristic2(n)
+        self.unreachable_distance = INF
+        self.distance_table = None
         if adjacency is None:
             if find_adjacency is None:
                 raise ValueError('Must inlclude either adjacency or find_adjacency')
             else:
                 adjacency = find_adjacency(m, n)
+        if exact_heuristic:
+            if find_adjacency is None:
+                raise ValueError('exact_heuristic needs find_adjacency, to name the distance table')
+            self.distance_table = load_distance_table(find_adjacency, m, n)
+            self.find_distance_heuristic_func = find_distance_table_heuristic2(self.distance_table)
+            self.unreachable_distance = UNREACHABLE
         super().__init__(adjacency, name=name)
 
 
 # ==== Transition to HC ====
 
-from GridsAndGraphs.Pathfinding import transition_to_HC
-from GridsAndGraphs.CycleAndTheta import find_list_loop_from_carved_loop
+from GridsAndGraphs.Pathfinding import transition_to_HC, PathfindingWorkspace
+from GridsAndGraphs.CycleAndTheta import find_list_loop_from_carved_loop, find_followed_cycle_HC
 
 def ModifySolver_TransitionHC(SolverClass, cutoff_HC_guess=0.5):
     class Solver_TransitionHC(SolverClass):
@@ -75,12 +120,19 @@ def ModifySolver_TransitionHC(SolverClass, cutoff_HC_guess=0.5):
                 self.cutoff_HC = self.area
             else:
                 self.cutoff_HC = cutoff
+            if getattr(self, 'safety_certificate', None) is not None:
+                # the transition leaves the solver's own subgraph
+                self.safety_certificate = SafetyCertificate('subgraph')
+            if getattr(self, 'workspace', None) is None:
+                self.workspace = PathfindingWorkspace(self.area)
         
+        # the transition rewires the snake's own carved_path
+        shares_board = False
+
         def yield_moves_to_simulator(self, start):
-            self.carved_path = [None] * self.area
+            self.start_snake(start)
             self.loop = None
-            self.head = start
-            self.tail = start
+            self.followed_cycle = None
 
             for apples_eaten in range(self.cutoff_HC):
                 yield from self.find_and_commit_moves()
@@ -89,12 +141,81 @@ def ModifySolver_TransitionHC(SolverClass, cutoff_HC_guess=0.5):
 
             loop = find_list_loop_from_carved_loop(self.carved_path, head=self.head)
             self.loop = loop
+            self.followed_cycle = find_followed_cycle_HC(loop)
             while True:
                 yield from loop
 
+    # pickle finds classes by module and name, so name this class as it is exported
+    # eg. GridSolver_DronesRules_TransitionHC in GridSolvers.DronesRules
+    Solver_TransitionHC.__name__ = SolverClass.__name__ + '_TransitionHC'
+    Solver_TransitionHC.__qualname__ = Solver_TransitionHC.__name__
+    Solver_TransitionHC.__module__ = SolverClass.__module__
     return Solver_TransitionHC
 
 
+# ==== Solver Specs ====
+
+# solvers hold closures and precomputed tables, so are awkward and slow to pickle
+# a spec holds only the solver class and its arguments, so it can be sent to a worker process
+# and the solver rebuilt there, eg. SolverSpec(GridSolver_SPF_AOW_TransitionHC, m, n, cutoff=500)
+# or SolverSpec(Optimizer_FastForward, GridSolver_Dive, m, n)
+
+class SolverSpec:
+    def __init__(self, SolverClass, *args, **kwargs):
+        self.SolverClass = SolverClass
+        self.args = args
+        self.kwargs = kwargs
+        self.local_solver = None
+
+    def build_solver(self):
+        return self.SolverClass(*self.args, **self.kwargs)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['local_solver'] = None
+        return state
+
+    # for anything else, such as the name or estimate_moves_per_apple, 
+    # ask a solver built once in this process
+    def __getattr__(self, name):
+        if name.startswith('__') or name == 'local_solver':
+            raise AttributeError(name)
+        if self.local_solver is None:
+            self.local_solver = self.build_solver()
+        return getattr(self.local_solver, name)
+
+
+# ==== Safety Certificates ====
+
+# a solver which cannot fail by construction can say so with a certificate, eg. for one following the cycle loop
+# self.safety_certificate = SafetyCertificate('cycle', find_successors_cycle(loop))
+# a trusted simulation then skips checking its moves, see simulate_apple_draws,
+# and the games it does check in full also check that every move is one the certificate allows
+
+class SafetyCertificate:
+    def __init__(self, claim, successors=None):
+        self.claim = claim              # eg. 'cycle' or 'subgraph'
+        self.successors = successors    # the cells each cell may move to, None for any adjacent cell
+        self.checked_adjacency = None
+
+    def find_checked_adjacency(self, adjacency):
+        # the moves both legal and allowed, worked out once per grid
+        if self.successors is None:
+            return adjacency
+        if self.checked_adjacency is None or self.checked_adjacency[0] is not adjacency:
+            allowed = [tuple(x for x in successors if x in adjacent)
+                       for successors, adjacent in zip(self.successors, adjacency)]
+            self.checked_adjacency = (adjacency, allowed)
+        return self.checked_adjacency[1]
+
+def find_successors_cycle(loop, area=None):
+    # cells off the cycle may not be moved to from at all
+    successors = [()] * (area or len(loop))
+    for cell, next_cell in zip(loop, loop[1:] + loop[:1]):
+        successors[cell] = (next_cell,)
+    return successors
+
+
 # ==== Transition to DHCR ====
 
 # coming soon ;)
@@ -2,6 +2,7 @@
 Some simple Hamiltonian Cycles of even grids
 and spanning Theta(m*n-3, 2, 2) subgraphs of odd grids.
 """
+from array import array
 
 
 # ======== Hamiltonian Cycles ========
@@ -190,4 +191,73 @@ def find_theta_in_coords_haircomb(m, n):
     return long_path, hole1, hole2
 
 def find_theta_haircomb(m, n):
-    return find_theta_from_coords(find_theta_in_coords_haircomb(m, n), n)
\ No newline at end of file
+    return find_theta_from_coords(find_theta_in_coords_haircomb(m, n), n)
+
+
+# ======== Following a Cycle ========
+
+# a solver which follows a fixed cycle from now on sets solver.followed_cycle to one of these,
+# so a simulator can find the moves to each apple in O(1) time instead of playing them
+# a Theta subgraph is followed as a lap of length A-1, with both holes at the last index:
+# hole2 is taken only to eat an apple there, otherwise hole1
+
+class CyclicSegment:
+    """
+    The num_cells cells of a cycle from index beg on, wrapping round at most once,
+    read from a memoryview of the cycle, so iterated and measured without copying any cells.
+    """
+    def __init__(self, view, beg, num_cells):
+        self.view = view
+        self.beg = beg
+        self.num_cells = num_cells
+
+    def __len__(self):
+        return self.num_cells
+
+    def __iter__(self):
+        end = self.beg + self.num_cells
+        lap = len(self.view)
+        if end <= lap:
+            yield from self.view[self.beg:end]
+        else:
+            yield from self.view[self.beg:]
+            yield from self.view[:end-lap]
+
+class FollowedCycle:
+    def __init__(self, loop, hole2=None):
+        self.loop = loop
+        self.lap = len(loop)
+        self.view = memoryview(array('i', loop))
+        self.hole1 = loop[-1] if hole2 is not None else None
+        self.hole2 = hole2
+        self.loop_indices = find_indices_HC(loop + ([hole2] if hole2 is not None else []))
+        if hole2 is not None:
+            self.loop_indices[hole2] = self.lap - 1
+
+    def find_moves(self, head, apple):
+        loop_indices = self.loop_indices
+        return (loop_indices[apple] - loop_indices[head]) % self.lap or self.lap
+
+    def find_segment_after(self, cell, num_cells):
+        # the num_cells cells which follow cell along the lap
+        return CyclicSegment(self.view, (self.loop_indices[cell] + 1) % self.lap, num_cells)
+
+    def is_along(self, head, tail, length):
+        # a snake whose cells all lie between tail and head on the cycle lies along it, with no gaps
+        loop_indices = self.loop_indices
+        return (loop_indices[head] - loop_indices[tail]) % self.lap == length - 1
+
+    def find_free_cell(self, head, length, k, hole2_in_body=False):
+        # the k-th free cell ahead of a snake lying along the cycle,
+        # for a Theta, the hole not in the snake's lap comes last
+        num_free_in_lap = self.lap - length
+        if k < num_free_in_lap:
+            return self.loop[(self.loop_indices[head] + 1 + k) % self.lap]
+        return self.hole1 if hole2_in_body else self.hole2
+
+def find_followed_cycle_HC(loop):
+    return FollowedCycle(loop)
+
+def find_followed_cycle_theta(theta):
+    long_path, hole1, hole2 = theta
+    return FollowedCycle(long_path + [hole1], hole2)
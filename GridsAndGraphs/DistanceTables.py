@@ -0,0 +1,93 @@
+"""
+Tables of the directed distance between every pair of vertices of a graph, as exact A* heuristics.
+On the AOW and Dive subgraphs the distance is often far more than the Manhattan distance,
+which then leads A* to expand far more vertices than it needs to.
+
+table[goal, vertex] is the fewest moves from vertex to goal, as uint16, UNREACHABLE if there is no way.
+A table takes 2*A^2 bytes, 32 MB for the 64x64 grid, so is saved to disk once and memory mapped after.
+"""
+import os
+import numpy as np
+from GridsAndGraphs.Adjacencies import find_reverse_adjacency
+
+UNREACHABLE = 2**16 - 1
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'DistanceTables')
+
+
+# ==== Building tables ====
+
+def find_distance_table(adjacency):
+    # a BFS back from each goal along the reverse adjacency
+    area = len(adjacency)
+    if area >= UNREACHABLE:
+        raise ValueError('Distance tables need fewer than 2^16 - 1 vertices')
+    reverse_adjacency = find_reverse_adjacency(adjacency)
+    table = np.empty((area, area), dtype=np.uint16)
+    for goal in range(area):
+        distances = [UNREACHABLE] * area
+        distances[goal] = 0
+        frontier = [goal]
+        distance = 0
+        while frontier:
+            distance += 1
+            next_frontier = []
+            for vertex in frontier:
+                for previous in reverse_adjacency[vertex]:
+                    if distances[previous] == UNREACHABLE:
+                        distances[previous] = distance
+                        next_frontier.append(previous)
+            frontier = next_frontier
+        table[goal] = distances
+    return table
+
+def find_distance_table_path(find_adjacency, m, n, cache_dir=DEFAULT_CACHE_DIR):
+    # tables are named after the graph, so find_adjacency_AOW gives AOW_16x16.npy
+    graph_name = find_adjacency.__name__.removeprefix('find_adjacency_')
+    return os.path.join(cache_dir, f'{graph_name}_{m}x{n}.npy')
+
+def load_distance_table(find_adjacency, m, n, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    The distance table of the graph find_adjacency(m, n), memory mapped from cache_dir,
+    where it is built and saved first if it is not there yet.
+    With cache_dir None the table is built in memory and not saved.
+    """
+    if cache_dir is None:
+        return find_distance_table(find_adjacency(m, n))
+    path = find_distance_table_path(find_adjacency, m, n, cache_dir)
+    if not os.path.exists(path):
+        os.makedirs(cache_dir, exist_ok=True)
+        table = find_distance_table(find_adjacency(m, n))
+        # saved under a temporary name first, so other processes never map half a table
+        temporary_path = f'{path}.{os.getpid()}.tmp'
+        with open(temporary_path, 'wb') as file:
+            np.save(file, table)
+        os.replace(temporary_path, path)
+    return np.load(path, mmap_mode='r')
+
+
+# ==== Heuristics ====
+
+def find_distance_table_heuristic2(table):
+    """
+    As find_Manhattan_heuristic2: returns find_heuristic(goal), which gives heuristic(vertex),
+    for safe_path_finder_astar and transition_to_HC.
+    """
+    def find_distance_table_heuristic1(goal):
+        # one row is read per goal, as a list, since indexing the array itself is far slower
+        return table[goal].tolist().__getitem__
+    return find_distance_table_heuristic1
+
+def find_distance_table_func(table):
+    """
+    As find_Manhattan_distance_func: returns distance(vertex, goal), for astar.
+    """
+    last_goal = None
+    row = None
+    def distance_table_distance(vertex, goal):
+        nonlocal last_goal, row
+        if goal != last_goal:
+            last_goal = goal
+            row = table[goal].tolist()
+        return row[vertex]
+    return distance_table_distance
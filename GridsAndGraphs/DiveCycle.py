@@ -56,6 +56,127 @@ def asym_dive_cycle_even(n,left_dives, right_dives, offset_x=0):
 
     return path
 
+
+
+# ==== Dive cycles kept as runs ====
+
+# a dive cycle is a sequence of runs, each along part of a row:
+# run 2i and 2i+1 are the left part of dive i, then the bottom row, then the right parts of the dives in reverse,
+# the right part of dive i being runs 4k-2i-1 and 4k-2i, where k is the number of dives, and last the top row
+# changing a dive changes only its own runs, and the run and position of a cell follow from its row and column,
+# so unlike the list from asym_dive_cycle_even, nothing is rebuilt or searched in O(A) time
+
+class DiveCycle:
+    def __init__(self, m, n):
+        self.m = m
+        self.n = n
+        self.num_dives = k = m//2 - 1
+        self.num_runs = 4*k + 2
+        self.bottom_run = 2*k
+        self.left_dives = [None]*k
+        self.right_dives = [None]*k
+        # each run is range(starts[run], starts[run] + counts[run]*steps[run], steps[run])
+        self.starts = [0]*self.num_runs
+        self.steps = [1, -1]*k + [1] + [-1, 1]*k + [-1]
+        self.counts = [0]*self.num_runs
+        self.starts[2*k] = (m-1)*n
+        self.counts[2*k] = n
+        self.starts[-1] = n-1
+        self.counts[-1] = n
+        self.length = 2*n
+
+    def set_dive(self, i, left, right):
+        n = self.n
+        upper_row = (2*i+1)*n
+        lower_row = upper_row + n
+        if self.left_dives[i] is not None:
+            self.length -= 2*(self.left_dives[i] + self.right_dives[i] + 2)
+        self.length += 2*(left + right + 2)
+        self.left_dives[i] = left
+        self.right_dives[i] = right
+
+        run = 2*i
+        self.starts[run] = upper_row
+        self.starts[run+1] = lower_row + left
+        self.counts[run] = self.counts[run+1] = left + 1
+        run = 4*self.num_dives - 2*i - 1
+        self.starts[run] = lower_row + n-1
+        self.starts[run+1] = upper_row + n-1 - right
+        self.counts[run] = self.counts[run+1] = right + 1
+
+    def set_dives(self, left_dives, right_dives=None):
+        # without right_dives, the right parts fill what the left ones leave, as in dive_cycle_even
+        # only the dives which changed are patched
+        if right_dives is None:
+            right_dives = [self.n - left - 2 for left in left_dives]
+        if left_dives == self.left_dives and right_dives == self.right_dives:
+            return
+        for i, (left, right) in enumerate(zip(left_dives, right_dives)):
+            if left != self.left_dives[i] or right != self.right_dives[i]:
+                self.set_dive(i, left, right)
+
+    def locate(self, cell):
+        # the run of cell and its position along it, None if cell is not on the cycle
+        n = self.n
+        row, column = divmod(cell, n)
+        if row == 0:
+            return self.num_runs - 1, n-1 - column
+        if row == self.m - 1:
+            return self.bottom_run, column
+        i = (row-1)//2
+        left = self.left_dives[i]
+        right = self.right_dives[i]
+        if row % 2:
+            if column <= left:
+                return 2*i, column
+            if column >= n-1 - right:
+                return 4*self.num_dives - 2*i, column - (n-1 - right)
+        else:
+            if column <= left:
+                return 2*i + 1, left - column
+            if column >= n-1 - right:
+                return 4*self.num_dives - 2*i - 1, n-1 - column
+        return None
+
+    def is_left_side(self, cell):
+        # whether cell comes before the bottom right corner, going down the left parts of the dives
+        return self.locate(cell)[0] <= self.bottom_run
+
+    def successor(self, cell):
+        run, position = self.locate(cell)
+        if position + 1 < self.counts[run]:
+            return cell + self.steps[run]
+        run = (run + 1) % self.num_runs
+        while not self.counts[run]:
+            run = (run + 1) % self.num_runs
+        return self.starts[run]
+
+    def find_path(self, head, target):
+        # the cells after head up to target along the cycle, as a path list
+        starts, steps, counts = self.starts, self.steps, self.counts
+        run, position = self.locate(head)
+        target_run, target_position = self.locate(target)
+        start, step = starts[run], steps[run]
+        if run == target_run and position < target_position:
+            return list(range(start + (position+1)*step, start + (target_position+1)*step, step))
+        path = list(range(start + (position+1)*step, start + counts[run]*step, step))
+        run = (run + 1) % self.num_runs
+        while run != target_run:
+            start, step = starts[run], steps[run]
+            path.extend(range(start, start + counts[run]*step, step))
+            run = (run + 1) % self.num_runs
+        start, step = starts[run], steps[run]
+        path.extend(range(start, start + (target_position+1)*step, step))
+        return path
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        for start, step, count in zip(self.starts, self.steps, self.counts):
+            yield from range(start, start + count*step, step)
+
+
 def double_comb_cycle(m, n):
     return dive_cycle_even(n, [n//2-1]*(m//2-1))
 
@@ -1,4 +1,6 @@
 import heapq
+from time import perf_counter
+from GridsAndGraphs.Adjacencies import find_reverse_adjacency
 
 INF = float("inf")
 
@@ -44,23 +46,67 @@ def find_perimeter(m, n):
     return perimeter
 
 
+# ======== Workspace ========
+
+# searches need arrays over every vertex, which cost O(A) to allocate on every call
+# a workspace keeps them between calls, with each entry stamped by the generation of the search that wrote it,
+# entries with an older stamp count as unwritten, so a new search clears them all in O(1)
+
+
+class PathfindingWorkspace:
+    def __init__(self, area):
+        self.area = area
+        self.generation = 0
+        self.stamps = [0] * area        # the generation in which each vertex was last reached
+        self.parents = [None] * area
+        self.scores = [0] * area
+        # barrier costs are stored plus barrier_base, which rises by area each time,
+        # so the costs of earlier snakes are all at most the new base, and block nothing
+        self.barrier_costs = [0] * area
+        self.barrier_base = 0
+        self.num_expanded = 0           # vertices expanded by the safe path finders, for benchmarks
+        # for find_moves_to_goal_by_time: the reverse of the last adjacency searched, and a layer per time
+        self.reversed_adjacency = None
+        self.reverse_adjacency = None
+        self.moves_layers = []
+        self.unreached = [INF] * area
+
+    def new_generation(self):
+        self.generation += 1
+        return self.generation
+
+    def find_reverse_adjacency(self, adjacency):
+        # built once per adjacency, as solvers search the same one every time
+        if self.reversed_adjacency is not adjacency:
+            self.reverse_adjacency = find_reverse_adjacency(adjacency)
+            self.reversed_adjacency = adjacency
+        return self.reverse_adjacency
+
+
 # ======== Standard Path Finding ========
 
 # do not take into account that the snake can move out of the way
 
 
-def astar(start, goal, blocked, adjacency, heuristic, limit=INF):
+def astar(start, goal, blocked, adjacency, heuristic, limit=INF, workspace=None):
     """
     A* pathfinding from ``start`` to ``goal`` on a graph
     defined by ``adjacency`` with obstacles.
+    Scores and parents are kept in ``workspace`` if given, otherwise in a new one.
     """
+    if workspace is None:
+        workspace = PathfindingWorkspace(len(adjacency))
+    generation = workspace.new_generation()
+    stamps = workspace.stamps
+    score = workspace.scores
+    came_from = workspace.parents
 
     # Priority queue: (heuristic, -score, cell)
     prio_queue = []
     heapq.heappush(prio_queue, (heuristic(start, goal), 0, start))
-    
-    came_from = {}
-    score = {start: 0}
+    stamps[start] = generation
+    score[start] = 0
+    max_score = limit + 1
     
     while prio_queue:
         _, negative_score, current = heapq.heappop(prio_queue)
@@ -68,16 +114,19 @@ def astar(start, goal, blocked, adjacency, heuristic, limit=INF):
         if current == goal:
             # Reconstruct path
             path = []
-            while current in came_from:
+            while current != start:
                 path.append(current)
                 current = came_from[current]
             return path[::-1]
         
         new_score = 1 - negative_score
         for neighbor in adjacency[current]:
-            if neighbor in blocked or new_score >= score.get(neighbor, limit+1):
+            if neighbor in blocked:
+                continue
+            if new_score >= (score[neighbor] if stamps[neighbor] == generation else max_score):
                 continue
             
+            stamps[neighbor] = generation
             score[neighbor] = new_score
             h_score = new_score + heuristic(neighbor, goal)
             if h_score <= limit:
@@ -93,9 +142,15 @@ def astar(start, goal, blocked, adjacency, heuristic, limit=INF):
 # on a safe graph, such as the AOW or Dive subgraphs, this will always give a path
 
 
-def find_barrier_costs_from_carved_path(tail, head, carved_path):
-    barrier_costs = [0] * len(carved_path)
-    counter = 1
+def find_barrier_costs_from_carved_path(tail, head, carved_path, workspace=None):
+    # with a workspace, its barrier_costs are written, offset by a new barrier_base
+    if workspace is None:
+        barrier_costs = [0] * len(carved_path)
+        counter = 1
+    else:
+        barrier_costs = workspace.barrier_costs
+        workspace.barrier_base += workspace.area
+        counter = workspace.barrier_base + 1
     vertex = tail
     barrier_costs[vertex] = counter
     while vertex != head:
@@ -104,87 +159,335 @@ def find_barrier_costs_from_carved_path(tail, head, carved_path):
         barrier_costs[vertex] = counter    
     return barrier_costs
     
-def safe_path_finder_BFS(start, end, barrier_costs, adjacency):
-    barrier_costs[start] = INF   # hack: prevents failure in back-tracking via parent_of
-    
-    area = len(adjacency)
-    parent_of = [None] * area
+def safe_path_finder_BFS(start, end, barrier_costs, adjacency, workspace=None, barrier_base=None):
+    # a vertex is blocked at distance d while d + barrier_base < barrier_costs[vertex]
+    # barrier_base is by default that of the workspace, for costs from find_barrier_costs_from_carved_path
+    if workspace is None:
+        workspace = PathfindingWorkspace(len(adjacency))
+    if barrier_base is None:
+        barrier_base = workspace.barrier_base
+    distance = barrier_base + 1
+    generation = workspace.new_generation()
+    reached = workspace.stamps
+    parent_of = workspace.parents
+    reached[start] = generation    # prevents failure in back-tracking via parent_of
+
     stack = [start]
     next_stack = []
-    distance = 1
+    num_expanded = 0
     while stack:
         
         while stack:
             vertex = stack.pop()            
+            num_expanded += 1
             for neighbour in adjacency[vertex]:
-                if parent_of[neighbour] != None:
+                if reached[neighbour] == generation:
                     continue
                 if distance < barrier_costs[neighbour]:
                     continue
 
                 if neighbour == end:
+                    workspace.num_expanded += num_expanded
                     path = [end]
                     while vertex != start:
                         path.append(vertex)
                         vertex = parent_of[vertex]
                     return path[::-1]
 
+                reached[neighbour] = generation
                 parent_of[neighbour] = vertex
                 next_stack.append(neighbour)
         
         stack, next_stack = next_stack, []
         distance += 1
+    workspace.num_expanded += num_expanded
     return None
 
-# an A* implemetation should be faster
+def safe_path_finder_astar(start, end, barrier_costs, adjacency, heuristic, workspace=None, barrier_base=None,
+                           unreachable=INF):
+    """
+    As safe_path_finder_BFS, but expanding the vertices in order of distance + heuristic(vertex).
+    The heuristic must be consistent, falling by at most 1 on every move of the directed graph,
+    as Manhattan distance does on any subgraph of the grid, and the directed distance of a distance table does.
+    Then each vertex is reached first at the same distance as by the BFS, and the path is as short.
+    Vertices with a heuristic of at least unreachable cannot reach the end, and are not searched.
+    """
+    if workspace is None:
+        workspace = PathfindingWorkspace(len(adjacency))
+    if barrier_base is None:
+        barrier_base = workspace.barrier_base
+    generation = workspace.new_generation()
+    reached = workspace.stamps
+    distance_to = workspace.scores
+    parent_of = workspace.parents
+    reached[start] = generation
+    distance_to[start] = 0
+
+    # a move keeps distance + heuristic the same or raises it, by 2 for Manhattan distance, so a heap is not needed:
+    # vertices with the current estimate are expanded from stack, deepest first, the rest wait in later_stacks
+    estimate = heuristic(start)
+    stack = [(0, start, estimate)]
+    later_stacks = {}
+    num_expanded = 0
+    while True:
+
+        while stack:
+            distance, vertex, to_end = stack.pop()
+            if distance != distance_to[vertex]:
+                # reached again at a shorter distance since
+                continue
+            num_expanded += 1
+
+            new_distance = distance + 1
+            time = barrier_base + new_distance
+            for neighbour in adjacency[vertex]:
+                if reached[neighbour] == generation and new_distance >= distance_to[neighbour]:
+                    continue
+                if time < barrier_costs[neighbour]:
+                    continue
+
+                if neighbour == end:
+                    # no vertex left to expand has a lower estimate, so no shorter path remains
+                    workspace.num_expanded += num_expanded
+                    path = [end]
+                    while vertex != start:
+                        path.append(vertex)
+                        vertex = parent_of[vertex]
+                    return path[::-1]
+
+                reached[neighbour] = generation
+                distance_to[neighbour] = new_distance
+                parent_of[neighbour] = vertex
+                new_to_end = heuristic(neighbour)
+                if new_to_end < to_end:
+                    stack.append((new_distance, neighbour, new_to_end))
+                elif new_to_end < unreachable:
+                    later_stacks.setdefault(new_distance + new_to_end, []).append((new_distance, neighbour, new_to_end))
+
+        if not later_stacks:
+            break
+        estimate = min(later_stacks)
+        stack = later_stacks.pop(estimate)
+    workspace.num_expanded += num_expanded
+    return None
 
 
 # ======== Expensive Safe Path Finding ========
 
-# safe as above, but finds the optimal path
-# checks every possible path, so is VERY SLOW!!
+# safe as above, but finds the optimal path, which may loop around to wait for the snake to move out of the way
+# the cheap path first bounds the search, so only strictly shorter paths are looked for
 
 
-def astar_with_temporary_obstacles(start, goal, blocked, adjacency, heuristic, limit=INF):
-    # blocked is a dict {cell: end_time}
-    # cells are blocked from t=0 until their end_time.
-    
-    # Priority queue: (heuristic, -score, cell, path)
-    prio_queue = []
-    heapq.heappush(prio_queue, (heuristic(start, goal), 0, start, [start]))
-    
-    visited = set()
-    visited.add((start, 0))
-    
+def find_moves_to_goal_by_time(goal, free_from, adjacency, num_times, workspace=None, deadline=None):
+    """
+    moves_to_goal[t][v], the fewest moves from v at time t to the goal,
+    if cells may be entered more than once, INF if there is no way.
+    free_from[cell] is the first time at which cell can be entered, less one.
+    Times from num_times on are given as if nothing were blocked, which is a lower bound.
+    The layers are the workspace's own, so are overwritten by its next call.
+    Returns None once perf_counter() passes deadline, which is checked after every layer.
+    """
+    area = len(adjacency)
+    if workspace is None:
+        workspace = PathfindingWorkspace(area)
+    reverse_adjacency = workspace.find_reverse_adjacency(adjacency)
+    # times from num_blocked_times on all share the last layer, found as if nothing were blocked
+    num_blocked_times = min(num_times, max(free_from))
+    layers = workspace.moves_layers
+    while len(layers) <= num_blocked_times:
+        layers.append([INF] * area)
+
+    moves = layers[num_blocked_times]
+    moves[:] = workspace.unreached
+    moves[goal] = 0
+    frontier = [goal]
+    while frontier:
+        next_frontier = []
+        for vertex in frontier:
+            for previous in reverse_adjacency[vertex]:
+                if moves[previous] == INF:
+                    moves[previous] = moves[vertex] + 1
+                    next_frontier.append(previous)
+        frontier = next_frontier
+
+    for time in range(num_blocked_times - 1, -1, -1):
+        if deadline is not None and perf_counter() > deadline:
+            return None
+        later_moves = moves
+        moves = layers[time]
+        for vertex, adjacent in enumerate(adjacency):
+            fewest = INF
+            for neighbour in adjacent:
+                if time < free_from[neighbour]:
+                    continue
+                if later_moves[neighbour] < fewest:
+                    fewest = later_moves[neighbour]
+            moves[vertex] = fewest + 1
+        moves[goal] = 0
+    return layers[:num_blocked_times] + [layers[num_blocked_times]] * (num_times + 1 - num_blocked_times)
+
+DEADLINE_CHECK_EXPANSIONS = 64
+
+def search_exact_safe_path(start, goal, barrier_costs, adjacency, barrier_base, limit, max_states=INF, deadline=None,
+                           workspace=None):
+    """
+    The shortest path from start to goal, without start, of at most limit moves,
+    that enters no cell twice or while it is blocked, as in safe_path_finder_BFS.
+    Returns the path, None if there is none, and the number of states queued,
+    or gives up and returns None, None once more than max_states are queued or perf_counter() passes deadline.
+    The deadline bounds the whole call, the heuristic's layers included,
+    as it is checked after every layer and every DEADLINE_CHECK_EXPANSIONS states expanded.
+
+    A* over states (cell, arrival time), with parent pointers instead of path copies.
+    Its heuristic is the exact distance if cells could be entered twice, see find_moves_to_goal_by_time.
+    The cells a state's path has visited are kept as the bits of an int, and a state is dropped
+    if another at the same cell and time has visited only cells it has, as every way on from it is open to the other too.
+    """
+    area = len(adjacency)
+    free_from = [max(cost - barrier_base - 1, 0) for cost in barrier_costs]
+    moves_to_goal = find_moves_to_goal_by_time(goal, free_from, adjacency, limit, workspace, deadline)
+    if moves_to_goal is None:
+        return None, None
+    if moves_to_goal[0][start] > limit:
+        return None, 0
+
+    # each state is an index into these lists
+    state_cells = [start]
+    state_parents = [-1]
+    state_visited = [1 << start]
+    visited_at = {}     # cell + area * arrival time: the visited cells of each state queued there
+
+    # Priority queue: (heuristic, -score, state)
+    prio_queue = [(moves_to_goal[0][start], 0, 0)]
+    num_expanded = 0
     while prio_queue:
-        _, negative_score, current, path = heapq.heappop(prio_queue)
-        
+        _, negative_score, state = heapq.heappop(prio_queue)
+        num_expanded += 1
+        current = state_cells[state]
+
         if current == goal:
-            return path[1:]
-        
+            num_states = len(state_cells)
+            path = []
+            while state:
+                path.append(state_cells[state])
+                state = state_parents[state]
+            return path[::-1], num_states
+
         new_score = 1 - negative_score
+        visited = state_visited[state]
+        later_moves = moves_to_goal[new_score]
         for neighbor in adjacency[current]:
-            
+
             # Obstacle check
-            if new_score <= blocked.get(neighbor, 0):
+            if new_score <= free_from[neighbor]:
                 continue
-            
+
             # No revisiting cells
-            if neighbor in path:
+            if visited >> neighbor & 1:
                 continue
-            
-            state = (current, new_score)
-            if state not in visited:
-                visited.add(state)
-                h_score = new_score + heuristic(neighbor, goal)
-                if h_score<=limit:
-                    heapq.heappush(prio_queue, (h_score, -new_score, neighbor, path + [neighbor]))
 
-    return None
+            h_score = new_score + later_moves[neighbor]
+            if h_score > limit:
+                continue
+
+            new_visited = visited | 1 << neighbor
+            others = visited_at.setdefault(neighbor + area * new_score, [])
+            if any(other & ~new_visited == 0 for other in others):
+                continue
+            others.append(new_visited)
+
+            state_cells.append(neighbor)
+            state_parents.append(state)
+            state_visited.append(new_visited)
+            heapq.heappush(prio_queue, (h_score, -new_score, len(state_cells) - 1))
+        
+        if len(state_cells) > max_states:
+            return None, None
+        if deadline is not None and num_expanded % DEADLINE_CHECK_EXPANSIONS == 0 and perf_counter() > deadline:
+            return None, None
+
+    return None, len(state_cells)
+
+def astar_with_temporary_obstacles(start, goal, blocked, adjacency, limit=INF, workspace=None):
+    """
+    The shortest path from start to goal, without start, that enters no cell twice or while it is blocked.
+    blocked is a dict {cell: end_time}, cells are blocked from t=0 until their end_time.
+    The path safe_path_finder_BFS finds first bounds search_exact_safe_path,
+    whose heuristic, the exact distance by time, is at least any heuristic of the cell alone.
+    """
+    area = len(adjacency)
+    if workspace is None:
+        workspace = PathfindingWorkspace(area)
+
+    # barrier costs offset past any costs already in the workspace,
+    # and the next base moved past these costs in turn, see PathfindingWorkspace
+    barrier_base = workspace.barrier_base + area
+    barrier_costs = workspace.barrier_costs
+    for cell, end_time in blocked.items():
+        barrier_costs[cell] = barrier_base + end_time + 1
+    workspace.barrier_base = barrier_base + max(max(blocked.values(), default=0) + 1 - area, 0)
 
-# You could be smart, and use a cheap one first, and then use the expensive one, throwing out paths longer than the cheap path...
+    best_path = safe_path_finder_BFS(start, goal, barrier_costs, adjacency, workspace, barrier_base)
+    if best_path is not None:
+        limit = min(limit, len(best_path) - 1)
+    if limit == INF:
+        limit = area - 1    # no path enters a cell twice
+    path, _ = search_exact_safe_path(start, goal, barrier_costs, adjacency, barrier_base, limit, workspace=workspace)
+    return best_path if path is None else path
 
 
+# ======== Tiered Safe Path Finding ========
+
+# the cheap path first, then the exact search for a strictly shorter one, within a budget per call
+
+
+class TieredSafePathFinder:
+    """
+    Finds paths as safe_path_finder_BFS does, then looks for a shorter one with search_exact_safe_path,
+    keeping the cheap path if the exact search queues more than max_states states or takes over max_seconds.
+    Only max_seconds bounds the exact search's heuristic, which takes O(A) per move of the cheap path up to the snake's length,
+    so it is the budget to set on large grids.
+    Counts how often the exact search improves the path, by how much, and what it costs.
+    """
+    def __init__(self, area, max_states=20000, max_seconds=None):
+        self.workspace = PathfindingWorkspace(area)
+        self.max_states = max_states
+        self.max_seconds = max_seconds
+        self.num_searches = 0
+        self.num_improved = 0
+        self.num_out_of_budget = 0
+        self.moves_saved = 0
+        self.exact_states = 0
+        self.exact_seconds = 0
+
+    def find_path(self, start, end, barrier_costs, adjacency, barrier_base):
+        self.num_searches += 1
+        path = safe_path_finder_BFS(start, end, barrier_costs, adjacency, self.workspace, barrier_base)
+        limit = len(adjacency) - 1 if path is None else len(path) - 1
+
+        start_time = perf_counter()
+        deadline = None if self.max_seconds is None else start_time + self.max_seconds
+        exact_path, num_states = search_exact_safe_path(start, end, barrier_costs, adjacency, barrier_base,
+                                                        limit, self.max_states, deadline, self.workspace)
+        self.exact_seconds += perf_counter() - start_time
+        if num_states is None:
+            self.num_out_of_budget += 1
+            return path
+        self.exact_states += num_states
+        if exact_path is None:
+            return path
+        self.num_improved += 1
+        if path is not None:
+            self.moves_saved += len(path) - len(exact_path)
+        return exact_path
+
+    def print_counts(self, name=''):
+        num_searches = max(self.num_searches, 1)
+        print(f"{name}{self.num_searches} searches, improved {self.num_improved}, "
+              f"out of budget {self.num_out_of_budget}, moves saved {self.moves_saved}, "
+              f"exact search {self.exact_states/num_searches:.1f} states "
+              f"and {self.exact_seconds/num_searches*1e3:.2f} ms per search")
+
 
 # ======== Transition to Hamiltonian Cycle ========
 
@@ -192,84 +495,134 @@ def astar_with_temporary_obstacles(start, goal, blocked, adjacency, heuristic, l
 # it is possible to re-orient the snake to lie along a Hamiltonian Cycle in O(A) time
 
 
-def inflate_by_walking_away(start, end, adjacency, carved_path, visited_vertices, distance_to_target):
+# the vertices in the loop are those stamped with the generation of the transition,
+# the inflating walks return how many vertices they add to it
+
+def inflate_by_walking_away(start, end, adjacency, carved_path, visited, generation, distance_to_target):
     # go for a walk between the start and end,
     # choosing at each step the furthest unvisited vertex from the end
     vertex = start
-    visited_vertices.remove(end)    # hack: will be re-added by the following code
+    visited[end] = 0    # hack: will be re-added by the following code
+    num_added = -1
     while vertex != end:
         best_dist = -INF
         next_vertex = None
         for neighbour in adjacency[vertex]:
-            if neighbour in visited_vertices:
+            if visited[neighbour] == generation:
                 continue
             dist = distance_to_target(neighbour)
             if dist > best_dist:
                 best_dist = dist
                 next_vertex = neighbour
-        visited_vertices.add(next_vertex)
+        visited[next_vertex] = generation
+        num_added += 1
         carved_path[vertex] = next_vertex
         vertex = next_vertex
-    return
+    return num_added
 
-def inflate_by_walking_blindly(start, end, adjacency, carved_path, visited_vertices):
+def inflate_by_walking_away_grid(start, end, adjacency, carved_path, visited, generation, rows, columns):
+    # as inflate_by_walking_away by Manhattan distance, read from the row and column of each vertex
+    end_row = rows[end]
+    end_column = columns[end]
+    vertex = start
+    visited[end] = 0
+    num_added = -1
+    while vertex != end:
+        best_dist = -1
+        next_vertex = None
+        for neighbour in adjacency[vertex]:
+            if visited[neighbour] == generation:
+                continue
+            dist = abs(rows[neighbour] - end_row) + abs(columns[neighbour] - end_column)
+            if dist > best_dist:
+                best_dist = dist
+                next_vertex = neighbour
+        visited[next_vertex] = generation
+        num_added += 1
+        carved_path[vertex] = next_vertex
+        vertex = next_vertex
+    return num_added
+
+def inflate_by_walking_blindly(start, end, adjacency, carved_path, visited, generation):
     # DOES NOT WORK YET!
     # go for a walk between the start and end, 
     # avoiding the end if possible
     # can be used without a distance heuristic but will take a little longer
     vertex = start
-    visited_vertices.remove(end)    # hack: will be re-added by the following code
+    visited[end] = 0    # hack: will be re-added by the following code
+    num_added = -1
     while vertex != end:
         for neighbour in adjacency[vertex]:
-            if neighbour in visited_vertices:
+            if visited[neighbour] == generation:
                 continue
             next_vertex = neighbour
             break
         else:
             next_vertex = end
-        visited_vertices.add(next_vertex)
+        visited[next_vertex] = generation
+        num_added += 1
         carved_path[vertex] = next_vertex
         vertex = next_vertex
-    return
+    return num_added
 
-def transition_to_HC(solver):
+def transition_to_HC(solver, grid_arrays=True):
+    """
+    Yields the moves of the snake as it turns its own loop into a Hamiltonian cycle, then follows it.
+    Grid solvers walk away by Manhattan distance, which with grid_arrays is read from
+    a row and column array made once, instead of from a closure made for each walk.
+    """
     carved_path = solver.carved_path
     adjacency = solver.adjacency
+    area = len(adjacency)
 
     tail = solver.tail
     head = solver.head
     apple = solver.apple
+
+    # the solver searches nothing else until the transition is done, so its workspace is free to use
+    workspace = getattr(solver, "workspace", None) or PathfindingWorkspace(area)
+    generation = workspace.new_generation()
+    visited = workspace.stamps
     
     # track what vertices are in the loop, starting with those in the snake
     vertex = tail
-    visited_vertices = set([tail])
+    visited[tail] = generation
+    num_visited = 1
     while vertex != head:
         vertex = carved_path[vertex]
-        visited_vertices.add(vertex)
+        visited[vertex] = generation
+        num_visited += 1
 
     # define how to inflate the loop  between the start and end
     # recommended to use a distance heursitic, but not important
-    if hasattr(solver, "find_distance_heuristic_func"):
+    manhattan = hasattr(solver, "n") and getattr(solver, "distance_table", None) is None
+    if grid_arrays and manhattan and hasattr(solver, "find_distance_heuristic_func"):
+        n = solver.n
+        rows = [vertex // n for vertex in range(area)]
+        columns = [vertex % n for vertex in range(area)]
+        def inflate_between(start, end):
+            return inflate_by_walking_away_grid(start, end, adjacency, carved_path, visited, generation, rows, columns)
+    elif hasattr(solver, "find_distance_heuristic_func"):
         def inflate_between(start, end):
             distance_heuristic = solver.find_distance_heuristic_func(end)
-            return inflate_by_walking_away(start, end, adjacency, carved_path, visited_vertices, distance_heuristic)
+            return inflate_by_walking_away(start, end, adjacency, carved_path, visited, generation, distance_heuristic)
     else:
         def inflate_between(start, end):
-            return inflate_by_walking_blindly(start, end, adjacency, carved_path, visited_vertices)
+            return inflate_by_walking_blindly(start, end, adjacency, carved_path, visited, generation)
 
     # connect head to tail to form a loop
     if tail in adjacency[head]:
         carved_path[head] = tail
     else:
-        inflate_between(head, tail)
+        num_visited += inflate_between(head, tail)
 
     # inflate the loop until it fills the space - becomes a Hamiltonian Cycle
     next_vertex = carved_path[head]
-    while len(visited_vertices) != len(adjacency):
+    while num_visited != area:
         for neighbour in adjacency[head]:
-            if neighbour in visited_vertices: 
+            if visited[neighbour] == generation: 
                 continue
-            inflate_between(head, next_vertex)
+            num_visited += inflate_between(head, next_vertex)
             next_vertex = carved_path[head]
             break
         
@@ -0,0 +1,53 @@
+"""
+The body of a snake which moves along paths, as solvers that do not share the simulator's Board track it.
+The cells are kept tail first in a buffer of capacity 2A, so moving along a path costs O(path length)
+however long the snake is, where rebuilding the body as a list costs O(length) on every apple.
+"""
+
+
+class SnakeBody:
+    def __init__(self, area):
+        self.area = area
+        # the body is cells[end-length:end], always in one piece so that it can be read as one slice
+        self.cells = [None] * (2*area)
+        self.end = 0
+        self.length = 0
+        # the body before the last move, which moving never overwrites: cells[previous_end-previous_length:previous_end]
+        self.previous_end = 0
+        self.previous_length = 0
+
+    def start(self, start):
+        self.end = 0
+        self.length = 0
+        self.move_along([start], 1)
+
+    def move_along(self, path, growth=1):
+        # the head enters each cell of the path in turn, and the snake is growth longer at the end
+        num_moves = len(path)
+        end = self.end
+        if end + num_moves > len(self.cells):
+            # the body moves back to the front of the buffer, which leaves room for A more moves at least
+            self.cells[:self.length] = self.cells[end-self.length:end]
+            end = self.length
+        self.cells[end:end+num_moves] = path
+        self.previous_end = end
+        self.previous_length = self.length
+        self.end = end + num_moves
+        self.length += growth
+
+    def find_cells(self):
+        # the cells of the snake, tail first, as a new list
+        return self.cells[self.end-self.length:self.end]
+
+    def find_previous_cells(self):
+        # the cells of the snake before the last move_along, tail first, as a new list
+        return self.cells[self.previous_end-self.previous_length:self.previous_end]
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, i):
+        # snake[0] is the tail and snake[-1] the head
+        if i < 0:
+            return self.cells[self.end + i]
+        return self.cells[self.end - self.length + i]
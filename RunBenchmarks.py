@@ -0,0 +1,33 @@
+"""
+Benchmarks building blocks of the solvers against the versions they replace, see Tests/Benchmark.py.
+"""
+
+# import benchmarks to run
+from Tests.Benchmark import benchmark_safe_path_finders, benchmark_tiered_safe_path_finder, benchmark_transition_to_HC
+from Tests.Benchmark import benchmark_dive_cycles, benchmark_snake_bodies, benchmark_drones_rules
+from Tests.Benchmark import benchmark_checked_games
+
+# choose grid sizes
+sizes = [(16, 16), (32, 32), (48, 48), (64, 64)]
+# and for the dive cycles, whose games are far quicker
+dive_sizes = [(16, 16), (32, 32), (64, 64), (128, 128)]
+# and for Drone's Rules, timed in moves per second
+rule_sizes = [(32, 32), (64, 64)]
+
+# choose number of games to take states from, and a seed, None for random games
+num_games = 2
+seed = 1
+
+# choose the exact search's budget of states per search, for the tiered safe path finder
+max_states = 20000
+# and its time budget per search in seconds, None for no limit, which bounds the exact search's heuristic too
+max_seconds = None
+
+# run benchmarks
+benchmark_safe_path_finders(sizes, num_games, seed)
+benchmark_tiered_safe_path_finder([size for size in sizes if size[0] * size[1] <= 256], num_games, max_states, seed, max_seconds)
+benchmark_transition_to_HC(sizes, num_games, seed)
+benchmark_dive_cycles(dive_sizes, 1, seed)
+benchmark_snake_bodies(dive_sizes, 1, seed)
+benchmark_drones_rules(rule_sizes, 1, seed)
+benchmark_checked_games()
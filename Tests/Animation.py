@@ -9,6 +9,7 @@ import pygame
 from random import choice
 from random import seed as rand_set_seed
 from GridsAndGraphs.Adjacencies import find_adjacency_grid
+from Tests.Simulation import FreeCellPool
 
 
 BG_COLOR    = (0, 0, 0)
@@ -50,22 +51,22 @@ class GridAnimator():
         area = self.area
         solver = self.solver
         adjacency = self.adjacency
-        vertices = list(range(area))
+        free_cells = FreeCellPool(area)
         occupied = [False] * area
         next_tail = [None] * area
-        start = choice(vertices)
+        start = choice(free_cells.cells)
+        free_cells.occupy(start)
         occupied[start] = True
         head = start
         tail = start
-        apple = start
         length = 1
         move_counter = 0
         move_generator = solver.yield_moves_to_simulator(start)
         self.start_new_game(start)
         self.refresh_screen()
         for apples_eaten in range(area-1):
-            while occupied[apple]:
-                apple = choice(vertices)
+            # drawn as in simulate_rejection_sampling, so failed seeds from Debug replay here
+            apple = free_cells.random_cell()
             solver.apple = apple
             self.draw_apple(apple)
             self.refresh_screen()
@@ -82,6 +83,7 @@ class GridAnimator():
                     print('ERROR: collision with body!')
                     return None
                 occupied[new_head] = True
+                free_cells.shift(new_head, tail)
                 next_tail[head] = new_head
                 self.update_snake(head, new_head, tail)
                 self.update_banner(length, move_counter)
@@ -89,6 +91,7 @@ class GridAnimator():
                 head = new_head
                 tail = next_tail[tail]
             occupied[apple] = True
+            free_cells.occupy(apple)
             next_tail[head] = apple
             self.update_snake(head, apple)
             head = apple
@@ -0,0 +1,446 @@
+"""
+Benchmarks of the building blocks of solvers, each against the version it replaces,
+on the states met in real games.
+"""
+import time
+from random import Random, seed as rand_set_seed
+from GridsAndGraphs.Adjacencies import find_adjacency_grid, find_adjacency_AOW
+from GridsAndGraphs.DistanceTables import load_distance_table, find_distance_table_heuristic2, UNREACHABLE
+from GridsAndGraphs.Pathfinding import PathfindingWorkspace, safe_path_finder_BFS, safe_path_finder_astar, TieredSafePathFinder
+from GridsAndGraphs.Pathfinding import transition_to_HC
+from GridsAndGraphs.DiveCycle import DiveCycle, asym_dive_cycle_even
+from GridsAndGraphs.SnakeBody import SnakeBody
+from GridSolvers.SafePath import GridSolver_SPF_AOW, best_HC_cutoff_constant
+from GridSolvers.Dive import GridSolver_Dive
+from GridSolvers.AsymDive import GridSolver_AsymDive
+from GridSolvers.DronesRules import GridSolver_DronesRules
+from Tests.Simulation import simulate_rejection_sampling, is_game_checked, find_game_seed
+
+
+# ==== Safe path finders ====
+
+def record_safe_path_queries(m, n, num_games, seed=None):
+    """
+    Plays games of SPF AOW BFS, returns the search made for each apple,
+    as the head, apple, timeline and barrier base, with the solver for its adjacency and heuristic.
+    """
+    solver = GridSolver_SPF_AOW(m, n)
+    queries = []
+    find_moves = solver.find_moves
+    def find_and_record_moves():
+        queries.append((solver.head, solver.apple, solver.last_occupied.copy(), solver.time - solver.length))
+        return find_moves()
+    solver.find_moves = find_and_record_moves
+
+    if seed is not None:
+        rand_set_seed(seed)
+    adjacency = find_adjacency_grid(m, n)
+    for game in range(num_games):
+        simulate_rejection_sampling(adjacency, solver)
+    return solver, queries
+
+def benchmark_safe_path_finders(sizes=((16, 16), (32, 32), (48, 48), (64, 64)), num_games=2, seed=None):
+    """
+    Runs the BFS safe path finder, and A* guided by Manhattan distance and by the AOW distance table,
+    on the same searches, those of SPF AOW BFS,
+    prints the mean vertices expanded and the time per search, then the speed-up of each A* over the BFS,
+    and the number of searches on which the paths differ in length from the BFS, which should be 0.
+    """
+    print(f"{'Grid':<8}{'Searches':>10}{'BFS nodes':>12}{'A* nodes':>12}{'Table nodes':>13}"
+          f"{'BFS us':>10}{'A* us':>10}{'Table us':>10}{'A* x':>8}{'Table x':>9}{'Longer':>8}")
+    for m, n in sizes:
+        solver, queries = record_safe_path_queries(m, n, num_games, seed)
+        adjacency = solver.adjacency
+        find_heuristics = {'A*': solver.find_distance_heuristic_func,
+                           'Table': find_distance_table_heuristic2(load_distance_table(find_adjacency_AOW, m, n))}
+
+        results = {}
+        for name in ('BFS', 'A*', 'Table'):
+            workspace = PathfindingWorkspace(m * n)
+            lengths = []
+            last_time = time.perf_counter()
+            if name == 'BFS':
+                for head, apple, last_occupied, barrier_base in queries:
+                    path = safe_path_finder_BFS(head, apple, last_occupied, adjacency, workspace, barrier_base)
+                    lengths.append(len(path))
+            else:
+                find_heuristic = find_heuristics[name]
+                for head, apple, last_occupied, barrier_base in queries:
+                    path = safe_path_finder_astar(head, apple, last_occupied, adjacency, find_heuristic(apple),
+                                                  workspace, barrier_base, UNREACHABLE)
+                    lengths.append(len(path))
+            delta_time = time.perf_counter() - last_time
+            results[name] = (workspace.num_expanded / len(queries), delta_time / len(queries) * 1e6, lengths)
+
+        bfs_nodes, bfs_time, bfs_lengths = results['BFS']
+        astar_nodes, astar_time, astar_lengths = results['A*']
+        table_nodes, table_time, table_lengths = results['Table']
+        num_longer = sum(x != y or x != z for x, y, z in zip(bfs_lengths, astar_lengths, table_lengths))
+        print(f"{f'{m}x{n}':<8}{len(queries):>10}{bfs_nodes:>12.1f}{astar_nodes:>12.1f}{table_nodes:>13.1f}"
+              f"{bfs_time:>10.1f}{astar_time:>10.1f}{table_time:>10.1f}"
+              f"{bfs_time/astar_time:>8.2f}{bfs_time/table_time:>9.2f}{num_longer:>8}")
+
+def benchmark_tiered_safe_path_finder(sizes=((8, 8), (12, 12), (16, 16)), num_games=2, max_states=20000, seed=None,
+                                      max_seconds=None):
+    """
+    Runs the tiered safe path finder on the searches of SPF AOW BFS,
+    prints how often the exact search shortens the BFS path and what it costs.
+    """
+    for m, n in sizes:
+        solver, queries = record_safe_path_queries(m, n, num_games, seed)
+        path_finder = TieredSafePathFinder(m * n, max_states, max_seconds)
+        for head, apple, last_occupied, barrier_base in queries:
+            path_finder.find_path(head, apple, last_occupied, solver.adjacency, barrier_base)
+        path_finder.print_counts(f'{m}x{n}: ')
+
+
+# ==== Transition to HC ====
+
+def record_transition_states(m, n, num_games, cutoff_constant=best_HC_cutoff_constant, seed=None):
+    """
+    Plays games of SPF AOW BFS, returns the state in which SPF AOW TransitionHC would start its transition,
+    as the carved path, head, tail and apple, with the solver.
+    """
+    solver = GridSolver_SPF_AOW(m, n)
+    cutoff = int(solver.area * cutoff_constant)
+    states = []
+    find_moves = solver.find_moves
+    def find_and_record_moves():
+        if solver.length == cutoff + 1:
+            states.append((solver.carved_path.copy(), solver.head, solver.tail, solver.apple))
+        return find_moves()
+    solver.find_moves = find_and_record_moves
+
+    if seed is not None:
+        rand_set_seed(seed)
+    adjacency = find_adjacency_grid(m, n)
+    for game in range(num_games):
+        simulate_rejection_sampling(adjacency, solver)
+    return solver, states
+
+def benchmark_transition_to_HC(sizes=((16, 16), (32, 32), (48, 48), (64, 64)), num_games=4, seed=None):
+    """
+    Runs transition_to_HC from the same states with Manhattan distance read from arrays, and from closures,
+    prints the time per transition, and the number of transitions in which the moves differ, which should be 0.
+    """
+    print(f"{'Grid':<8}{'Transitions':>13}{'Closures ms':>13}{'Arrays ms':>11}{'Speed-up':>10}{'Differ':>8}")
+    for m, n in sizes:
+        solver, states = record_transition_states(m, n, num_games, seed=seed)
+        results = {}
+        for grid_arrays in (False, True):
+            all_moves = []
+            total_time = 0
+            for carved_path, head, tail, apple in states:
+                solver.carved_path = carved_path.copy()
+                solver.head, solver.tail, solver.apple = head, tail, apple
+                last_time = time.perf_counter()
+                moves = list(transition_to_HC(solver, grid_arrays))
+                total_time += time.perf_counter() - last_time
+                all_moves.append((moves, solver.carved_path))
+            results[grid_arrays] = (total_time / len(states) * 1e3, all_moves)
+
+        closure_time, closure_moves = results[False]
+        array_time, array_moves = results[True]
+        num_differ = sum(x != y for x, y in zip(closure_moves, array_moves))
+        print(f"{f'{m}x{n}':<8}{len(states):>13}{closure_time:>13.2f}{array_time:>11.2f}"
+              f"{closure_time/array_time:>10.2f}{num_differ:>8}")
+
+
+# ==== Dive cycles ====
+
+def record_dive_queries(SolverClass, m, n, num_games, seed=None):
+    """
+    Plays games of Dive or AsymDive, returns the path asked for with each apple,
+    as the head, apple, and the left and right dives of the cycle followed.
+    """
+    solver = SolverClass(m, n)
+    queries = []
+    find_path = solver.find_path
+    def find_and_record_path(apple):
+        head = solver.snake[-1]
+        path = find_path(apple)
+        queries.append((head, apple, solver.loop.left_dives.copy(), solver.loop.right_dives.copy()))
+        return path
+    solver.find_path = find_and_record_path
+
+    if seed is not None:
+        rand_set_seed(seed)
+    adjacency = find_adjacency_grid(m, n)
+    for game in range(num_games):
+        simulate_rejection_sampling(adjacency, solver)
+    return queries
+
+def benchmark_dive_cycles(sizes=((16, 16), (32, 32), (64, 64), (128, 128)), num_games=1, seed=None):
+    """
+    Replays the paths of Dive and AsymDive games with the cycle rebuilt as a list when the dives change,
+    as the solvers did, and with a DiveCycle patched, prints the time per apple to update the cycle
+    and find the head and apple on it, then the time per apple including the path,
+    and the number of paths which differ, which should be 0.
+    """
+    print(f"{'Solver':<10}{'Grid':<10}{'Apples':>8}{'Mean path':>11}{'List find us':>14}{'Runs find us':>14}"
+          f"{'List us':>10}{'Runs us':>10}{'Differ':>8}")
+    for SolverClass in (GridSolver_Dive, GridSolver_AsymDive):
+        for m, n in sizes:
+            queries = record_dive_queries(SolverClass, m, n, num_games, seed)
+            num_queries = len(queries)
+
+            # finding the head and apple only
+            last_time = time.perf_counter()
+            last_dives = None
+            for head, apple, left_dives, right_dives in queries:
+                if (left_dives, right_dives) != last_dives:
+                    last_dives = (left_dives, right_dives)
+                    loop = asym_dive_cycle_even(n, left_dives, right_dives)
+                loop.index(head)
+                loop.index(apple)
+            list_find_time = time.perf_counter() - last_time
+
+            last_time = time.perf_counter()
+            cycle = DiveCycle(m, n)
+            for head, apple, left_dives, right_dives in queries:
+                cycle.set_dives(left_dives, right_dives)
+                cycle.locate(head)
+                cycle.locate(apple)
+            runs_find_time = time.perf_counter() - last_time
+
+            # and the paths
+            list_paths = []
+            last_time = time.perf_counter()
+            last_dives = None
+            for head, apple, left_dives, right_dives in queries:
+                if (left_dives, right_dives) != last_dives:
+                    last_dives = (left_dives, right_dives)
+                    loop = asym_dive_cycle_even(n, left_dives, right_dives)
+                beg = loop.index(head) + 1
+                end = loop.index(apple) + 1
+                list_paths.append(loop[beg:end] if beg < end else loop[beg:] + loop[:end])
+            list_time = time.perf_counter() - last_time
+
+            runs_paths = []
+            last_time = time.perf_counter()
+            cycle = DiveCycle(m, n)
+            for head, apple, left_dives, right_dives in queries:
+                cycle.set_dives(left_dives, right_dives)
+                runs_paths.append(cycle.find_path(head, apple))
+            runs_time = time.perf_counter() - last_time
+
+            mean_path = sum(map(len, runs_paths)) / num_queries
+            num_differ = sum(x != y for x, y in zip(list_paths, runs_paths))
+            print(f"{SolverClass.__name__.removeprefix('GridSolver_'):<10}{f'{m}x{n}':<10}{num_queries:>8}"
+                  f"{mean_path:>11.1f}{list_find_time/num_queries*1e6:>14.2f}{runs_find_time/num_queries*1e6:>14.2f}"
+                  f"{list_time/num_queries*1e6:>10.2f}{runs_time/num_queries*1e6:>10.2f}{num_differ:>8}")
+
+
+# ==== Snake bodies ====
+
+def record_dive_paths(SolverClass, m, n, num_games, seed=None):
+    # the start and the path to each apple of games of Dive or AsymDive
+    solver = SolverClass(m, n)
+    games = []
+    start_new_game = solver.start_new_game
+    def start_and_record_game(start):
+        games.append((start, []))
+        start_new_game(start)
+    solver.start_new_game = start_and_record_game
+    find_path = solver.find_path
+    def find_and_record_path(apple):
+        path = find_path(apple)
+        games[-1][1].append(path)
+        return path
+    solver.find_path = find_and_record_path
+
+    if seed is not None:
+        rand_set_seed(seed)
+    adjacency = find_adjacency_grid(m, n)
+    for game in range(num_games):
+        simulate_rejection_sampling(adjacency, solver)
+    return games
+
+def benchmark_snake_bodies(sizes=((16, 16), (32, 32), (64, 64), (128, 128)), num_games=1, seed=None):
+    """
+    Replays the paths of Dive and AsymDive games, tracking the snake as a list rebuilt on every apple,
+    as the solvers did, and as a SnakeBody, side by side.
+    Prints the time per apple to track the snake, with and without what Fast Forward reads in the first half of the game:
+    its blocked cells for each path longer than the snake, from a copy of the list taken on every apple as it did,
+    or from the body before the path,
+    and the number of apples on which the blocked cells differ, which should be 0.
+    """
+    print(f"{'Solver':<10}{'Grid':<10}{'List FF us':>12}{'Body FF us':>12}{'List us':>10}{'Body us':>10}{'Differ':>8}")
+    for SolverClass in (GridSolver_Dive, GridSolver_AsymDive):
+        for m, n in sizes:
+            area = m * n
+            end_FF = area // 2
+            games = record_dive_paths(SolverClass, m, n, num_games, seed)
+            list_times = [0, 0]
+            body_times = [0, 0]
+            num_differ = 0
+            body = SnakeBody(area)
+            for start, paths in games:
+                snake = [start]
+                body.start(start)
+                for length, path in enumerate(paths, 1):
+                    fast_forward = length < end_FF
+
+                    searches = fast_forward and length < len(path)
+
+                    last_time = time.perf_counter()
+                    if fast_forward:
+                        list_cells = snake.copy()
+                    # as update_snake did
+                    if length + 1 <= len(path):
+                        snake = path[-(length + 1):]
+                    else:
+                        snake = snake[-(length + 1 - len(path)):] + path
+                    if searches:
+                        list_blocked = set(list_cells)
+                    list_times[fast_forward] += time.perf_counter() - last_time
+
+                    last_time = time.perf_counter()
+                    body.move_along(path)
+                    if searches:
+                        body_blocked = set(body.find_previous_cells())
+                    body_times[fast_forward] += time.perf_counter() - last_time
+
+                    if searches:
+                        num_differ += list_blocked != body_blocked
+
+            num_ff_apples = len(games) * (end_FF - 1)
+            num_late_apples = len(games) * (area - end_FF)
+            print(f"{SolverClass.__name__.removeprefix('GridSolver_'):<10}{f'{m}x{n}':<10}"
+                  f"{list_times[True]/num_ff_apples*1e6:>12.2f}{body_times[True]/num_ff_apples*1e6:>12.2f}"
+                  f"{list_times[False]/num_late_apples*1e6:>10.2f}{body_times[False]/num_late_apples*1e6:>10.2f}"
+                  f"{num_differ:>8}")
+
+
+# ==== Drone's Rules ====
+
+def find_drones_rules_moves_branching(solver):
+    # the moves to the apple as find_and_commit_moves chose them, by the rules as an if/else tree
+    carved_path = solver.carved_path
+    n = solver.n
+    tail = solver.tail
+    head = solver.head
+    apple = solver.apple
+    i_vector, j_vector = n, 1
+    target_i, target_j = divmod(apple, n)
+    i, j = divmod(head, n)
+    i_even = i%2 == 0
+    j_even = j%2 == 0
+    while True:
+        if i_even:
+            if j_even:
+                if target_j < j:
+                    first_vector, second_vector = -j_vector, i_vector
+                else:
+                    first_vector, second_vector = i_vector, -j_vector
+            else:
+                if target_i < i:
+                    first_vector, second_vector = -i_vector, -j_vector
+                else:
+                    first_vector, second_vector = -j_vector, -i_vector
+        else:
+            if j_even:
+                if target_i > i:
+                    first_vector, second_vector = i_vector, j_vector
+                else:
+                    first_vector, second_vector = j_vector, i_vector
+            else:
+                if target_j > j:
+                    first_vector, second_vector = j_vector, -i_vector
+                else:
+                    first_vector, second_vector = -i_vector, j_vector
+        first_new_head = head + first_vector
+        if carved_path[first_new_head] is None or first_new_head == tail:
+            direction = first_vector
+            new_head = first_new_head
+        else:
+            direction = second_vector
+            new_head = head + second_vector
+        if new_head == apple:
+            carved_path[head] = apple
+            solver.tail = tail
+            solver.head = apple
+            yield apple
+            return
+        if direction == i_vector:
+            i += 1
+            i_even = not i_even
+        elif direction == -i_vector:
+            i -= 1
+            i_even = not i_even
+        elif direction == j_vector:
+            j += 1
+            j_even = not j_even
+        else:
+            j -= 1
+            j_even = not j_even
+        carved_path[head] = new_head
+        head = new_head
+        new_tail = carved_path[tail]
+        carved_path[tail] = None
+        tail = new_tail
+        yield head
+
+def benchmark_drones_rules(sizes=((32, 32), (64, 64)), num_games=1, seed=None):
+    """
+    Plays games of Drone's Rules with the rules as an if/else tree, as find_and_commit_moves had them,
+    and as the solver's lookup tables, side by side on the same apples.
+    Prints the moves per second of each, and the number of apples on which their heads differ, which should be 0.
+    """
+    rng = Random(seed)
+    print(f"{'Grid':<10}{'Moves':>12}{'Tree Mmoves/s':>15}{'Table Mmoves/s':>16}{'Speed-up':>10}{'Differ':>8}")
+    for m, n in sizes:
+        area = m * n
+        tree_solver = GridSolver_DronesRules(m, n)
+        table_solver = GridSolver_DronesRules(m, n)
+        tree_time = 0
+        table_time = 0
+        num_moves = 0
+        num_differ = 0
+        for game in range(num_games):
+            start = rng.randrange(area)
+            tree_solver.start_snake(start)
+            table_solver.start_snake(start)
+            for apples_eaten in range(area - 1):
+                carved_path = table_solver.carved_path
+                head = table_solver.head
+                free_cells = [cell for cell in range(area) if carved_path[cell] is None and cell != head]
+                apple = free_cells[rng.randrange(len(free_cells))]
+                tree_solver.apple = apple
+                table_solver.apple = apple
+
+                last_time = time.perf_counter()
+                for num_tree_moves, new_head in enumerate(find_drones_rules_moves_branching(tree_solver), 1):
+                    pass
+                tree_time += time.perf_counter() - last_time
+
+                last_time = time.perf_counter()
+                for num_table_moves, new_head in enumerate(table_solver.find_and_commit_moves(), 1):
+                    pass
+                table_time += time.perf_counter() - last_time
+
+                num_moves += num_table_moves
+                num_differ += num_tree_moves != num_table_moves or tree_solver.tail != table_solver.tail
+        print(f"{f'{m}x{n}':<10}{num_moves:>12}{num_moves/tree_time/1e6:>15.2f}{num_moves/table_time/1e6:>16.2f}"
+              f"{tree_time/table_time:>10.2f}{num_differ:>8}")
+
+
+# ==== Checked games ====
+
+def benchmark_checked_games(area=1024, num_games=20000, check_fraction=0.05, master_seed=12345, num_bins=10):
+    """
+    Picks the games checked in full as simulate_rejection_sampling does, from the game's own seed as it did,
+    and from a stream of their own with is_game_checked,
+    and prints how many of each start in each tenth of the cells, as the start is the game's first draw.
+    The checked games should start evenly across the grid, within about the square root of the count.
+    """
+    print(f"{'Choice':<10}{'Checked':>9}  Checked games by the tenth of the cells they start in")
+    starts = [Random(find_game_seed(master_seed, game)).randrange(area) for game in range(num_games)]
+    choices = {'Own seed': lambda seed: Random(seed).random() < check_fraction,
+               'Stream': lambda seed: is_game_checked(seed, check_fraction)}
+    for name, is_checked in choices.items():
+        counts = [0] * num_bins
+        for game, start in enumerate(starts):
+            if is_checked(find_game_seed(master_seed, game)):
+                counts[start * num_bins // area] += 1
+        print(f"{name:<10}{sum(counts):>9}  " + ' '.join(f'{count:>5}' for count in counts))
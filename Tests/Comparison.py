@@ -1,17 +1,59 @@
+import os
 import time
-import statistics
+from functools import partial
 import matplotlib.pyplot as plt
-import numpy as np
 from GridsAndGraphs.Adjacencies import find_adjacency_grid
-from Tests.Simulation import run_multiple_games        
+from Tests.Simulation import run_multiple_games, run_until_confident, simulate_rejection_sampling
 
-def compare_methods(m, n, N, solvers, plot_estimates = False, colours = None):
+def find_progress_printer(name, N, interval=1):
+    # overwrites one line with the running mean at most once every interval seconds, 
+    # the final row of the table then replaces it
+    last_print = time.time()
+    def print_progress(results):
+        nonlocal last_print
+        current_time = time.time()
+        if current_time - last_print < interval or results.num_passes < 2:
+            return
+        last_print = current_time
+        print(f"{name:<20}{results.mean():>12.3f}{results.std():>10.3f}   {results.num_games}/{N} games", end='\r')
+    return print_progress
+
+def plot_score_histogram(ax, results, **kwargs):
+    # the unit bins of the accumulator, rebinned by Scott's rule
+    ax.hist(list(results.score_counts), bins=results.find_scotts_bins(), 
+            weights=list(results.score_counts.values()), density=True, **kwargs)
+
+def find_checkpoint_path(checkpoint_dir, prefix, index):
+    if checkpoint_dir is None:
+        return None
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    return os.path.join(checkpoint_dir, f'{prefix}_solver{index}.pkl')
+
+def run_games_for_comparison(adjacency, solver, N, target=None, max_time=None, **kwargs):
+    # a fixed number of games, or as many as needed to reach the target, see run_until_confident
+    if target is None:
+        return run_multiple_games(adjacency, solver, N, **kwargs)
+    return run_until_confident(adjacency, solver, target, N, max_time, **kwargs)
+
+def print_comparison_intro(m, n, N, target):
+    if target is None:
+        print(f"Comparing methods on {m}x{n} grid over {N} games:")
+    else:
+        print(f"Comparing methods on {m}x{n} grid until the mean is known to within {target:.2%}, up to {N} games:")
+
+def compare_methods(m, n, N, solvers, plot_estimates = False, colours = None, workers = None, seed = None,
+                    checkpoint_dir = None, target = None, max_time = None, check_fraction = 1):
     """
     Runs N games on an m x n grid for each solver in solvers,
     plots score distributions and mean moves per apple.
+    Games are spread over ``workers`` processes if given, see run_multiple_games.
+    With ``checkpoint_dir``, each solver's progress is saved there, and an interrupted run resumes from it.
+    With ``target``, each solver plays only until the 95% confidence interval of its mean score 
+    is within target of the mean, relative to it, with N games and ``max_time`` seconds per solver as budgets.
+    With ``check_fraction`` below 1, solvers with a safety certificate are checked in full only in that fraction of games.
     """
-    print(f"Comparing methods on {m}x{n} grid over {N} games:")
-    print(f"{'Method':<20}{'Mean':>12}{'Std Dev':>10}{'Time':>8}{'Fails':>8}{'Estimate':>12}")
+    print_comparison_intro(m, n, N, target)
+    print(f"{'Method':<20}{'Mean':>12}{'Std Dev':>10}{'Time':>8}{'Games':>8}{'Fails':>8}{'Estimate':>12}")
     
     area = m * n
     apple_axis = list(range(area-1)) # number of apples eaten, length-1
@@ -42,19 +84,19 @@ def compare_methods(m, n, N, solvers, plot_estimates = False, colours = None):
             estimate_totals[index] = int(estimate_total)
     
     adjacency = find_adjacency_grid(m, n)
-    scotts_constant = 3.5 * N**(-1/3)   
+    tester = partial(simulate_rejection_sampling, check_fraction=check_fraction)
     last_time = time.time()
     for index, solver in enumerate(solvers):
-        scores, avg_score_per_apple, num_fails = run_multiple_games(adjacency, solver, N)
-        mean = statistics.mean(scores)
-        std  = statistics.stdev(scores)
+        results = run_games_for_comparison(adjacency, solver, N, target, max_time, tester=tester,
+                                     workers=workers, seed=seed,
+                                     progress=find_progress_printer(solver.name, N),
+                                     checkpoint=find_checkpoint_path(checkpoint_dir, f'{m}x{n}', index))
+        mean = results.mean()
+        std  = results.std()
+        num_fails = results.num_fails
 
-        bin_width = max(int(std * scotts_constant ), 1) # best bin width according to Scott's rule
-        min_val = (min(scores)//bin_width) * bin_width
-        max_val = (max(scores)//bin_width) * bin_width
-        bins = np.arange(min_val - 0.5, max_val + 1.5, bin_width)
-        ax1.hist(scores, bins=bins, density=True, color=colours[index], alpha=0.5, label = solver.name)
-        ax2.plot(apple_axis, avg_score_per_apple, color=colours[index], linewidth=2, label = solver.name)
+        plot_score_histogram(ax1, results, color=colours[index], alpha=0.5, label = solver.name)
+        ax2.plot(apple_axis, results.find_avg_moves_per_apple(), color=colours[index], linewidth=2, label = solver.name)
 
         current_time = time.time()
         delta_time = current_time - last_time
@@ -64,6 +106,7 @@ def compare_methods(m, n, N, solvers, plot_estimates = False, colours = None):
             f"{mean:>12.3f}"
             f"{std:>10.3f}"
             f"{delta_time:>8.3f}"
+            f"{results.num_games:>8}"
             f"{num_fails:>8}"
             f"{estimate_totals[index]:>12}"
         )
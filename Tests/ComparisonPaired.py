@@ -0,0 +1,178 @@
+"""
+Paired comparison of solvers using common random numbers.
+Every solver replays the same corpus of apple draws, so differences between solvers
+are not drowned out by differences between apples, and far fewer games are needed.
+
+A draw is not a cell but an index k among the free cells,
+so any solver can replay it whatever state its snake is in.
+Game g, draw j is uniform in [0, A-j): draw 0 places the start, draw j the j-th apple.
+"""
+import os
+import time
+import statistics
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from GridsAndGraphs.Adjacencies import find_adjacency_grid
+from Tests.Simulation import simulate_apple_draws
+
+
+# ==== The corpus ====
+
+def make_apple_corpus(area, N, seed=None, path=None, chunk_size=2**22):
+    """
+    Draws a corpus of N games on a grid of the given area.
+    If ``path`` is given it is written there as .npy, a chunk of about chunk_size draws at a time,
+    so memory stays that of a chunk however large the corpus, and returned memory mapped,
+    otherwise it is returned in memory.
+    """
+    rng = np.random.default_rng(seed)
+    dtype = np.uint16 if area <= 2**16 else np.uint32
+    if path is None:
+        corpus = np.empty((N, area), dtype=dtype)
+    else:
+        # written under a temporary name first, so a half written corpus is never loaded
+        temporary_path = f'{path}.{os.getpid()}.tmp.npy'
+        corpus = np.lib.format.open_memmap(temporary_path, mode='w+', dtype=dtype, shape=(N, area))
+
+    # the rows of a chunk depend on the area alone, so the corpus is the same whether saved or not
+    chunk_rows = max(chunk_size // area, 1)
+    highs = np.arange(area, 0, -1)
+    for beg in range(0, N, chunk_rows):
+        end = min(beg + chunk_rows, N)
+        corpus[beg:end] = rng.integers(0, highs, size=(end - beg, area), dtype=dtype)
+
+    if path is None:
+        return corpus
+    corpus.flush()
+    del corpus
+    os.replace(temporary_path, path)
+    return load_apple_corpus(path)
+
+def load_apple_corpus(path):
+    # memory mapped, so huge corpora are read lazily and shared between processes by the OS
+    return np.load(path, mmap_mode='r')
+
+def simulate_apple_corpus(adjacency, solver, draws):
+    """
+    Plays a single game, replaying one row of the corpus.
+    """
+    draws = iter(draws.tolist())
+    return simulate_apple_draws(adjacency, solver, lambda num_free: next(draws))
+
+
+# ==== Playing the corpus ====
+
+def play_corpus(adjacency, solver, corpus, beg, end):
+    """
+    Plays games beg to end of the corpus, returns the score of each, None for a fail.
+    ``corpus`` may be the path of a saved corpus, so that each worker maps it itself.
+    """
+    if hasattr(solver, 'build_solver'):
+        # a SolverSpec, so build the solver in this process
+        solver = solver.build_solver()
+    if isinstance(corpus, str):
+        corpus = load_apple_corpus(corpus)
+    scores = []
+    for game in range(beg, end):
+        moves_per_apple = simulate_apple_corpus(adjacency, solver, corpus[game])
+        if moves_per_apple is None:
+            print('Failure: ' + solver.name + f' game {game}')
+            scores.append(None)
+        else:
+            scores.append(sum(moves_per_apple))
+    return scores
+
+def _play_corpus_in_worker(args):
+    # top level, so that it can be sent to a worker process
+    return play_corpus(*args)
+
+def play_corpus_parallel(adjacency, solver, corpus, workers=None):
+    N = len(load_apple_corpus(corpus) if isinstance(corpus, str) else corpus)
+    if workers is None or workers <= 1:
+        return play_corpus(adjacency, solver, corpus, 0, N)
+
+    num_chunks = min(N, 4 * workers)
+    bounds = [N * k // num_chunks for k in range(num_chunks+1)]
+    chunks = []
+    for beg, end in zip(bounds, bounds[1:]):
+        if isinstance(corpus, str):
+            chunks.append((adjacency, solver, corpus, beg, end))
+        else:
+            chunks.append((adjacency, solver, corpus[beg:end], 0, end-beg))
+    scores = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk_scores in pool.map(_play_corpus_in_worker, chunks):
+            scores.extend(chunk_scores)
+    return scores
+
+
+# ==== Comparison ====
+
+def find_paired_difference(scores, baseline_scores):
+    """
+    Mean and standard error of score - baseline over the games neither failed,
+    and the standard error the same number of independent games would have given.
+    """
+    pairs = [(x, y) for x, y in zip(scores, baseline_scores) if x is not None and y is not None]
+    if len(pairs) < 2:
+        return None, None, None
+    differences = [x - y for x, y in pairs]
+    root_N = len(pairs) ** 0.5
+    mean = statistics.mean(differences)
+    paired_se = statistics.stdev(differences) / root_N
+    unpaired_se = (statistics.variance([x for x, _ in pairs])
+                   + statistics.variance([y for _, y in pairs])) ** 0.5 / root_N
+    return mean, paired_se, unpaired_se
+
+def compare_methods_paired(m, n, N, solvers, corpus_path=None, seed=None, workers=None):
+    """
+    Runs the same N games on an m x n grid for each solver in solvers,
+    reports each mean score, and its difference from the first solver with the paired standard error.
+    The corpus is loaded from ``corpus_path`` if it exists, otherwise drawn and saved there.
+    """
+    area = m * n
+    if corpus_path is not None and os.path.exists(corpus_path):
+        corpus = load_apple_corpus(corpus_path)
+        if corpus.shape != (N, area):
+            raise ValueError(f'Corpus at {corpus_path} has shape {corpus.shape}, expected {(N, area)}')
+        corpus = corpus_path
+    else:
+        corpus = make_apple_corpus(area, N, seed, corpus_path)
+        if corpus_path is not None:
+            corpus = corpus_path
+
+    print(f"Comparing methods on {m}x{n} grid over the same {N} games:")
+    print(f"{'Method':<20}{'Mean':>12}{'Std Dev':>10}{'Time':>8}{'Fails':>8}"
+          f"{'Diff':>12}{'Paired SE':>12}{'Unpaired SE':>12}")
+
+    adjacency = find_adjacency_grid(m, n)
+    baseline_scores = None
+    last_time = time.time()
+    for solver in solvers:
+        scores = play_corpus_parallel(adjacency, solver, corpus, workers)
+        passes = [x for x in scores if x is not None]
+        num_fails = len(scores) - len(passes)
+        mean = statistics.mean(passes)
+        std  = statistics.stdev(passes)
+
+        diff, paired_se, unpaired_se = '-', '-', '-'
+        if baseline_scores is None:
+            baseline_scores = scores
+        else:
+            difference = find_paired_difference(scores, baseline_scores)
+            if difference[0] is not None:
+                diff, paired_se, unpaired_se = (f'{x:.3f}' for x in difference)
+
+        current_time = time.time()
+        delta_time = current_time - last_time
+        last_time = current_time
+
+        print(f"{solver.name:<20}"
+            f"{mean:>12.3f}"
+            f"{std:>10.3f}"
+            f"{delta_time:>8.3f}"
+            f"{num_fails:>8}"
+            f"{diff:>12}"
+            f"{paired_se:>12}"
+            f"{unpaired_se:>12}"
+        )
@@ -7,11 +7,11 @@ and estimates movement ticks.
 from random import choice
 from random import seed as rand_set_seed
 import time
-import statistics
 import matplotlib.pyplot as plt
-import numpy as np
 from GridsAndGraphs.Adjacencies import find_adjacency_grid
-from Tests.Simulation import run_multiple_games
+from Tests.Simulation import FreeCellPool
+from Tests.Comparison import (find_progress_printer, plot_score_histogram, find_checkpoint_path,
+                              run_games_for_comparison, print_comparison_intro)
 
 def find_ticks_per_apple(area):
     ticks_per_apple = [None] * (area-1)
@@ -30,24 +30,24 @@ def simulate_tfwr_rejection_sampling(adjacency, solver, seed=None):
     if seed != None:
         rand_set_seed(seed)   
     area = len(adjacency)
-    vertices = list(range(area))
     score_per_apple = [0] * (area-1)
     occupied = [False] * area
     next_tail = [None] * area
-    start = choice(vertices)
+    free_cells = FreeCellPool(area)
+    start = choice(free_cells.cells)
     occupied[start] = True
+    free_cells.occupy(start)
     head = start
     tail = head
     move_generator = solver.yield_moves_to_simulator(start)
-    next_apple = choice(vertices)
-    while next_apple == start:
-        next_apple = choice(vertices)
+    next_apple = free_cells.random_cell()
     for apple_num in range(area-1):
         apple = next_apple
         if apple_num < area-2:
-            next_apple = choice(vertices)
-            while next_apple == apple or occupied[next_apple]:
-                next_apple = choice(vertices)
+            # the apple is not yet covered, so reject it by hand
+            next_apple = free_cells.random_cell()
+            while next_apple == apple:
+                next_apple = free_cells.random_cell()
         move_counter = 0
         solver.apple = apple
         while True:
@@ -57,6 +57,7 @@ def simulate_tfwr_rejection_sampling(adjacency, solver, seed=None):
                 return None
             if new_head == apple:
                 occupied[apple] = True
+                free_cells.occupy(apple)
                 next_tail[head] = apple
                 head = apple
                 break
@@ -64,27 +65,32 @@ def simulate_tfwr_rejection_sampling(adjacency, solver, seed=None):
             if occupied[new_head]:
                 return None
             occupied[new_head] = True
+            free_cells.shift(new_head, tail)
             next_tail[head] = new_head
             head = new_head
             tail = next_tail[tail]
 
             if head == next_apple and apple_num != area-2:
-                next_apple = choice(vertices)
-                while occupied[next_apple] or next_apple == apple:
-                    next_apple = choice(vertices)
+                next_apple = free_cells.random_cell()
+                while next_apple == apple:
+                    next_apple = free_cells.random_cell()
                 solver.next_apple = next_apple
         score_per_apple[apple_num] = move_counter
     return score_per_apple
 
-def compare_methods_tfrw(m, n, N, solvers, colours = None):
+def compare_methods_tfrw(m, n, N, solvers, colours = None, workers = None, seed = None, checkpoint_dir = None,
+                         target = None, max_time = None):
     """
     Runs N games on an m x n grid for each solver in solvers,
     with apple generation as in TFWR,
     plots score distributions, mean moves per apple,
     and mean movement ticks per apple.
+    Games are spread over ``workers`` processes if given, see run_multiple_games.
+    With ``checkpoint_dir``, each solver's progress is saved there, and an interrupted run resumes from it.
+    With ``target``, each solver plays only until its mean score is known to that relative precision, see compare_methods.
     """
-    print(f"Comparing methods on {m}x{n} grid over {N} games:")
-    print(f"{'Method':<20}{'Mean':>12}{'Std Dev':>10}{'Time':>8}{'Fails':>8}{'Ticks':>12}")
+    print_comparison_intro(m, n, N, target)
+    print(f"{'Method':<20}{'Mean':>12}{'Std Dev':>10}{'Time':>8}{'Games':>8}{'Fails':>8}{'Ticks':>12}")
     
     area = m * n
     apple_axis = list(range(area-1)) # number of apples eaten, length-1
@@ -110,6 +116,7 @@ def compare_methods_tfrw(m, n, N, solvers, colours = None):
         f"{'-':>10}"
         f"{'-':>8}"
         f"{'-':>8}"
+        f"{'-':>8}"
         f"{3250000:>12}"
     )
     
@@ -118,19 +125,19 @@ def compare_methods_tfrw(m, n, N, solvers, colours = None):
         colours = [cmap(i) for i in range(len(solvers))]
 
     adjacency = find_adjacency_grid(m, n)
-    scotts_constant = 3.5 * N**(-1/3)   
     last_time = time.time()
     for index, solver in enumerate(solvers):
-        scores, avg_score_per_apple, num_fails = run_multiple_games(adjacency, solver, N, 
-                                                        tester = simulate_tfwr_rejection_sampling)
-        mean = statistics.mean(scores)
-        std  = statistics.stdev(scores)
+        results = run_games_for_comparison(adjacency, solver, N, target, max_time,
+                                    tester = simulate_tfwr_rejection_sampling,
+                                    workers = workers, seed = seed,
+                                    progress = find_progress_printer(solver.name, N),
+                                    checkpoint = find_checkpoint_path(checkpoint_dir, f'tfwr_{m}x{n}', index))
+        mean = results.mean()
+        std  = results.std()
+        num_fails = results.num_fails
+        avg_score_per_apple = results.find_avg_moves_per_apple()
 
-        bin_width = max(int(std * scotts_constant ), 1) # best bin width according to Scott's rule
-        min_val = (min(scores)//bin_width) * bin_width
-        max_val = (max(scores)//bin_width) * bin_width
-        bins = np.arange(min_val - 0.5, max_val + 1.5, bin_width)
-        ax1.hist(scores, bins=bins, density=True, color=colours[index], alpha=0.5, label = solver.name)
+        plot_score_histogram(ax1, results, color=colours[index], alpha=0.5, label = solver.name)
         ax2.plot(apple_axis, avg_score_per_apple, color=colours[index], linewidth=2, label = solver.name)
 
         avg_ticks_per_apple = [weight* score for weight, score in zip(ticks_per_apple, avg_score_per_apple)]
@@ -145,6 +152,7 @@ def compare_methods_tfrw(m, n, N, solvers, colours = None):
             f"{mean:>12.3f}"
             f"{std:>10.3f}"
             f"{delta_time:>8.3f}"
+            f"{results.num_games:>8}"
             f"{num_fails:>8}"
             f"{total_ticks:>12}"
         )
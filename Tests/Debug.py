@@ -2,25 +2,25 @@ import time
 from random import choice
 from random import seed as rand_set_seed
 from GridsAndGraphs.Adjacencies import find_adjacency_grid
+from Tests.Simulation import FreeCellPool
 
 
 def simulate_debug_rejection_sampling(adjacency, solver, seed=None): 
     if seed is not None:
         rand_set_seed(seed)   
     area = len(adjacency)
-    vertices = list(range(area))
     moves_per_apple = [0] * (area-1)
     carved_path = [None] * area
+    free_cells = FreeCellPool(area)
 
-    start = choice(vertices)
+    start = choice(free_cells.cells)
+    free_cells.occupy(start)
     head = start
     tail = head
-    apple = head
 
     apples_eaten = 0
     moves_this_apple = 0
-    while carved_path[apple] is not None or apple == head:
-        apple = choice(vertices)
+    apple = free_cells.random_cell()
     solver.apple = apple
     
     for new_head in solver.yield_moves_to_simulator(start):
@@ -37,17 +37,18 @@ def simulate_debug_rejection_sampling(adjacency, solver, seed=None):
             if apples_eaten == area-1:
                 return moves_per_apple
             moves_this_apple = 0
-            while carved_path[apple] is not None or apple == head:
-                apple = choice(vertices)
+            free_cells.occupy(apple)
+            apple = free_cells.random_cell()
             solver.apple = apple
             continue
 
         new_tail = carved_path[tail]
         carved_path[tail] = None
-        tail = new_tail
         if carved_path[new_head] is not None:
             print('ERROR: collision with body!')
             return None
+        free_cells.shift(new_head, tail)
+        tail = new_tail
 
 def animate_failures(m, n, N, solver, animator, tester = simulate_debug_rejection_sampling):
     adjacency = find_adjacency_grid(m, n)
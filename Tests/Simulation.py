@@ -1,32 +1,125 @@
-from random import choice
+import os
+import time
+import pickle
+from operator import le
+from itertools import count
+from random import choice, randrange, Random
 from random import seed as rand_set_seed
+from concurrent.futures import ProcessPoolExecutor
 
 
-def simulate_rejection_sampling(adjacency, solver, seed=None): 
-    if seed is not None:
-        rand_set_seed(seed)   
+# ==== Free cells ====
+
+class FreeCellPool:
+    """
+    The cells not covered by the snake, kept in a list with each cell's position in it,
+    so a uniformly random free cell is drawn in O(1) time however full the grid is.
+    Updates swap-remove, so are O(1) too.
+    """
+    def __init__(self, area):
+        self.cells = list(range(area))
+        self.position = list(range(area))
+
+    def occupy(self, cell):
+        # the snake grows on to cell
+        cells = self.cells
+        last = cells.pop()
+        if last != cell:
+            index = self.position[cell]
+            cells[index] = last
+            self.position[last] = index
+
+    def shift(self, enter, leave):
+        # the snake moves on to enter and off leave, so leave takes the place of enter
+        if enter == leave:
+            return
+        index = self.position[enter]
+        self.cells[index] = leave
+        self.position[leave] = index
+
+    def random_cell(self):
+        return choice(self.cells)
+
+
+# ==== The board ====
+
+class Board:
+    """
+    The snake and the apple, kept by the simulator and updated after every move.
+    time is the number of moves made, and last_occupied[cell] the move on which the head last entered cell,
+    which is in the snake while last_occupied[cell] > time - length.
+    A solver with ``shares_board`` is played with yield_moves_on_board(board) and reads it instead of keeping a copy,
+    see GraphSolverTemplate. Solvers must not write to it.
+    carved_path[cell] is the next cell of the snake towards the head, None at the head and off the snake.
+    """
+    def __init__(self, area, start, apple):
+        self.carved_path = [None] * area
+        self.head = start
+        self.tail = start
+        self.length = 1
+        self.apple = apple
+        self.time = 0
+        self.last_occupied = [-1] * area
+        self.last_occupied[start] = 0
+
+
+def simulate_apple_draws(adjacency, solver, draw_index, skip_cycles=True, use_paths=True, trusted=False):
+    """
+    Plays a single game, returns the moves taken for each apple, or None if the solver fails.
+    The start and each apple are the free cell at index ``draw_index(number of free cells)`` of the pool.
+
+    Once the solver sets ``followed_cycle`` and the snake lies along it, apples are counted along the cycle instead,
+    and with ``skip_cycles`` the rest of the game is found from cycle indices without asking the solver for moves.
+    Either way the result is the same.
+
+    With ``use_paths``, a solver with start_new_game and find_path is played a path at a time,
+    see simulate_path_chunks, with the same result.
+
+    A solver with a ``safety_certificate``, see GridSolvers.Templates, claims it cannot fail.
+    With ``trusted`` its moves are not checked at all, otherwise each must also be one the certificate allows.
+
+    The snake is kept on a Board, which a solver with ``shares_board`` reads instead of tracking the snake itself.
+    """
+    certificate = getattr(solver, 'safety_certificate', None)
+    trusted = trusted and certificate is not None
+    if certificate is not None:
+        adjacency = certificate.find_checked_adjacency(adjacency)
+    if use_paths and hasattr(solver, 'find_path') and hasattr(solver, 'start_new_game'):
+        return simulate_path_chunks(adjacency, solver, draw_index, trusted)
     area = len(adjacency)
-    vertices = list(range(area))
     moves_per_apple = [0] * (area-1)
-    carved_path = [None] * area
+    free_cells = FreeCellPool(area)
+    cells = free_cells.cells
 
-    start = choice(vertices)
+    start = cells[draw_index(area)]
+    free_cells.occupy(start)
     head = start
     tail = head
-    apple = head
 
+    cycle = None
     apples_eaten = 0
     moves_this_apple = 0
-    while carved_path[apple] is not None or apple == head:
-        apple = choice(vertices)
+    apple = cells[draw_index(area-1)]
     solver.apple = apple
-    
-    for new_head in solver.yield_moves_to_simulator(start):
-        if new_head not in adjacency[head]:
+    board = Board(area, start, apple)
+    carved_path = board.carved_path
+    last_occupied = board.last_occupied
+    time = 0
+    if getattr(solver, 'shares_board', False):
+        moves = solver.yield_moves_on_board(board)
+    else:
+        moves = solver.yield_moves_to_simulator(start)
+
+    for new_head in moves:
+        if not trusted and new_head not in adjacency[head]:
             return None
         moves_this_apple += 1
         carved_path[head] = new_head
         head = new_head
+        time += 1
+        last_occupied[head] = time
+        board.head = head
+        board.time = time
 
         if new_head == apple:
             moves_per_apple[apples_eaten] = moves_this_apple
@@ -34,34 +127,430 @@ def simulate_rejection_sampling(adjacency, solver, seed=None):
             if apples_eaten == area-1:
                 return moves_per_apple
             moves_this_apple = 0
-            while carved_path[apple] is not None or apple == head:
-                apple = choice(vertices)
+            if cycle is None:
+                cycle = getattr(solver, 'followed_cycle', None)
+                if cycle is not None and not cycle.is_along(head, tail, apples_eaten+1):
+                    cycle = None
+            if cycle is None:
+                free_cells.occupy(apple)
+                apple = cells[draw_index(area-1-apples_eaten)]
+            else:
+                hole2_in_body = cycle.hole2 is not None and (carved_path[cycle.hole2] is not None or head == cycle.hole2)
+                if skip_cycles:
+                    return skip_along_cycle(cycle, draw_index, moves_per_apple, apples_eaten, head, hole2_in_body)
+                apple = cycle.find_free_cell(head, apples_eaten+1, draw_index(area-1-apples_eaten), hole2_in_body)
             solver.apple = apple
+            board.apple = apple
+            board.length += 1
             continue
 
         new_tail = carved_path[tail]
         carved_path[tail] = None
-        tail = new_tail
-        if carved_path[new_head] is not None:
+        if not trusted and carved_path[new_head] is not None:
             return None
-        
+        if cycle is None:
+            free_cells.shift(new_head, tail)
+        tail = new_tail
+        board.tail = tail
 
-def run_multiple_games(adjacency, solver, N, tester = simulate_rejection_sampling):
+def simulate_path_chunks(adjacency, solver, draw_index, trusted=False):
     """
-    Collects moves-per-apple and total moves over N games
+    Plays a single game of a solver which gives whole paths, as simulate_apple_draws does.
+    After start_new_game(start), find_path(apple) returns the cells to move to, usually a list ending at the apple.
+    Such a path is checked and applied in bulk, anything else a move at a time.
+    With ``trusted`` nothing is checked.
     """
-    total_moves = []
-    total_moves_per_apple = [0] * (len(adjacency)-1)
-    num_fails = 0
-    for game in range(N):
-        moves_per_apple = tester(adjacency, solver)
-        if moves_per_apple is None:
-            num_fails += 1
-            print('Failure: ' + solver.name)
+    area = len(adjacency)
+    moves_per_apple = [0] * (area-1)
+    legal_moves = {(cell, neighbour) for cell, adjacent in enumerate(adjacency) for neighbour in adjacent}
+    free_cells = FreeCellPool(area)
+    cells = free_cells.cells
+    position = free_cells.position
+
+    # the snake is the last length cells of trail, and visit_time[cell] is the time of the last visit to cell,
+    # the cell entered at time t being trail[t - trimmed]
+    # only the snake's cells are read again, so the rest are trimmed once trail is over 2A long, keeping it O(A)
+    start = cells[draw_index(area)]
+    free_cells.occupy(start)
+    trail = [start]
+    trimmed = 0
+    max_trail = 2 * area
+    visit_time = [-1] * area
+    visit_time[start] = 0
+
+    apples_eaten = 0
+    moves_this_apple = 0
+    apple = cells[draw_index(area-1)]
+    solver.apple = apple
+    solver.start_new_game(start)
+
+    while True:
+        length = apples_eaten + 1
+        if len(trail) > max_trail:
+            trimmed += len(trail) - length
+            del trail[:-length]
+        path = solver.find_path(apple)
+        time = trimmed + len(trail) - 1
+
+        if type(path) is list and path and path[-1] == apple and len(set(path)) == len(path):
+            num_moves = len(path)
+            if not trusted:
+                if not legal_moves.issuperset(zip(trail[-1:] + path, path)):
+                    return None
+                # the t-th move, to path[t-1], must avoid the snake from its new tail trail[time+t-length+1] onwards
+                if not all(map(le, map(visit_time.__getitem__, path[:-1]),
+                               range(time+1-length, time+num_moves-length))):
+                    return None
+            # the tails which leave, which for a long path include some of its own cells
+            trail.extend(path)
+            for time, enter, leave in zip(count(time+1), path,
+                                          trail[time+1-length-trimmed:time+num_moves-length-trimmed]):
+                visit_time[enter] = time
+                if enter != leave:
+                    index = position[enter]
+                    cells[index] = leave
+                    position[leave] = index
+            visit_time[apple] = trimmed + len(trail) - 1
+
+            moves_per_apple[apples_eaten] = moves_this_apple + num_moves
+            apples_eaten += 1
+            if apples_eaten == area-1:
+                return moves_per_apple
+            moves_this_apple = 0
+            free_cells.occupy(apple)
+            apple = cells[draw_index(area-1-apples_eaten)]
+            solver.apple = apple
             continue
-        total_moves.append( sum(moves_per_apple) )
-        for apple, moves in enumerate(moves_per_apple):
+
+        for cell in path:
+            if not trusted and (trail[-1], cell) not in legal_moves:
+                return None
+            moves_this_apple += 1
+            time += 1
+            if cell == apple:
+                moves_per_apple[apples_eaten] = moves_this_apple
+                apples_eaten += 1
+                if apples_eaten == area-1:
+                    return moves_per_apple
+                moves_this_apple = 0
+                free_cells.occupy(apple)
+                apple = cells[draw_index(area-1-apples_eaten)]
+                solver.apple = apple
+            else:
+                if not trusted and visit_time[cell] > time - length:
+                    return None
+                free_cells.shift(cell, trail[time - length - trimmed])
+            length = apples_eaten + 1
+            trail.append(cell)
+            visit_time[cell] = time
+            if len(trail) > max_trail:
+                trimmed += len(trail) - length
+                del trail[:-length]
+
+def skip_along_cycle(cycle, draw_index, moves_per_apple, apples_eaten, head, hole2_in_body):
+    """
+    Finishes a game whose snake lies along the cycle it follows, with apples_eaten apples eaten,
+    in O(1) time per apple.
+    """
+    area = len(moves_per_apple) + 1
+    lap = cycle.lap
+    loop_indices = cycle.loop_indices
+    # for a Theta, the hole the snake last went through, so whether hole2 is in its lap
+    last_hole = cycle.hole2 if hole2_in_body else cycle.hole1
+    for apples_eaten in range(apples_eaten, area-1):
+        length = apples_eaten + 1
+        apple = cycle.find_free_cell(head, length, draw_index(area-length), hole2_in_body)
+        moves = cycle.find_moves(head, apple)
+        moves_per_apple[apples_eaten] = moves
+
+        if cycle.hole2 is not None:
+            # the holes are at the last index, which the head passes iff it is within moves ahead
+            if ((lap - 1 - loop_indices[head]) % lap or lap) <= moves:
+                last_hole = apple if loop_indices[apple] == lap - 1 else cycle.hole1
+            # the tail is within length+1 behind the head after eating
+            hole2_in_body = last_hole == cycle.hole2 and (loop_indices[apple] - (lap - 1)) % lap <= length
+        head = apple
+    return moves_per_apple
+
+def is_game_checked(seed, check_fraction):
+    """
+    Whether the game with this seed is checked in full, which is true of a fraction check_fraction of seeds.
+    Drawn from a stream of its own, derived from the seed, so the choice is independent of the game's apples,
+    which Random(seed) itself would not be, its first draw also giving the start cell.
+    With seed None it is drawn from the OS random source.
+    """
+    check_random = Random() if seed is None else Random(f'{seed}:check')
+    return check_random.random() < check_fraction
+
+def simulate_rejection_sampling(adjacency, solver, seed=None, skip_cycles=True, use_paths=True, check_fraction=1):
+    """
+    Plays a single game with uniformly random apples.
+    Apples are drawn from the free cells, which is equivalent to rejection sampling
+    but does not slow down as the grid fills.
+
+    With ``check_fraction`` below 1, only that fraction of the games of a solver with a safety certificate
+    are checked in full, the rest are trusted, see simulate_apple_draws.
+    Pass it to run_multiple_games as tester=functools.partial(simulate_rejection_sampling, check_fraction=0.05).
+    """
+    trusted = check_fraction < 1 and not is_game_checked(seed, check_fraction)
+    if seed is not None:
+        rand_set_seed(seed)
+    return simulate_apple_draws(adjacency, solver, randrange, skip_cycles, use_paths, trusted)
+
+
+# ==== Streaming statistics ====
+
+class ScoreAccumulator:
+    """
+    Running statistics of many games, updated as each game finishes,
+    in memory independent of the number of games.
+    Sums are kept as exact integers, so merging chunks of games in any grouping gives identical results.
+    """
+    def __init__(self, area):
+        self.num_passes = 0
+        self.num_fails = 0
+        self.sum_scores = 0
+        self.sum_squared_scores = 0
+        self.min_score = None
+        self.max_score = None
+        self.score_counts = {}      # histogram with bins of width 1, rebinned for plotting
+        self.total_moves_per_apple = [0] * (area-1)
+
+    def add_game(self, moves_per_apple):
+        if moves_per_apple is None:
+            self.num_fails += 1
+            return
+        self.add_scores([sum(moves_per_apple)], moves_per_apple)
+
+    def add_scores(self, scores, total_moves_per_apple):
+        # many passed games at once, with the moves for each apple summed over them
+        score_counts = self.score_counts
+        for score in scores:
+            self.num_passes += 1
+            self.sum_scores += score
+            self.sum_squared_scores += score * score
+            if self.min_score is None or score < self.min_score:
+                self.min_score = score
+            if self.max_score is None or score > self.max_score:
+                self.max_score = score
+            score_counts[score] = score_counts.get(score, 0) + 1
+        own_total_moves_per_apple = self.total_moves_per_apple
+        for apple, moves in enumerate(total_moves_per_apple):
+            own_total_moves_per_apple[apple] += moves
+
+    def merge(self, other):
+        self.num_passes += other.num_passes
+        self.num_fails += other.num_fails
+        self.sum_scores += other.sum_scores
+        self.sum_squared_scores += other.sum_squared_scores
+        if other.num_passes:
+            if self.min_score is None or other.min_score < self.min_score:
+                self.min_score = other.min_score
+            if self.max_score is None or other.max_score > self.max_score:
+                self.max_score = other.max_score
+        for score, count in other.score_counts.items():
+            self.score_counts[score] = self.score_counts.get(score, 0) + count
+        total_moves_per_apple = self.total_moves_per_apple
+        for apple, moves in enumerate(other.total_moves_per_apple):
             total_moves_per_apple[apple] += moves
-    num_passes = N - num_fails
-    avg_moves_per_apple = [x/num_passes for x in total_moves_per_apple]  
-    return total_moves, avg_moves_per_apple, num_fails
\ No newline at end of file
+
+    @property
+    def num_games(self):
+        return self.num_passes + self.num_fails
+
+    def mean(self):
+        return self.sum_scores / self.num_passes
+
+    def variance(self):
+        # sample variance, with the numerator computed exactly
+        N = self.num_passes
+        if N < 2:
+            return float('nan')
+        return (N * self.sum_squared_scores - self.sum_scores**2) / (N * (N-1))
+
+    def std(self):
+        return self.variance() ** 0.5
+
+    def find_relative_half_width(self, z=1.96):
+        # half-width of the confidence interval of the mean, relative to the mean
+        if self.num_passes < 2:
+            return float('inf')
+        return z * self.std() / self.num_passes**0.5 / abs(self.mean())
+
+    def find_avg_moves_per_apple(self):
+        num_passes = self.num_passes
+        return [x/num_passes for x in self.total_moves_per_apple]
+
+    def find_scotts_bins(self):
+        # best bin width according to Scott's rule, aligned to multiples of the width
+        bin_width = max(int(self.std() * 3.5 * self.num_passes**(-1/3)), 1)
+        min_val = (self.min_score//bin_width) * bin_width
+        max_val = (self.max_score//bin_width) * bin_width
+        num_bins = (max_val - min_val)//bin_width + 1
+        return [min_val - 0.5 + k*bin_width for k in range(num_bins+1)]
+
+
+# ==== Checkpoints ====
+
+# a checkpoint is the master seed and the accumulator so far,
+# games are played in order, so the accumulator also says how many games are done
+
+def save_checkpoint(path, seed, accumulator, name=''):
+    # write to a temporary file first, so a crash mid-write leaves the last checkpoint intact
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as file:
+        pickle.dump({'seed': seed, 'name': name, 'accumulator': accumulator}, file)
+    os.replace(temp_path, path)
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as file:
+        return pickle.load(file)
+
+
+# ==== Running many games ====
+
+def find_game_seed(master_seed, game):
+    """
+    The seed of game number ``game``, derived from ``master_seed``,
+    so that each game is the same however the games are shared between processes.
+    """
+    if master_seed is None:
+        return None
+    return f'{master_seed}:{game}'
+
+def play_games(adjacency, solver, master_seed, beg, end, tester=simulate_rejection_sampling, progress=None,
+               accumulator=None):
+    """
+    Plays games beg to end, returns a ScoreAccumulator of their results,
+    added to ``accumulator`` if given.
+    ``progress(accumulator)`` is called after each game if given.
+    """
+    if hasattr(solver, 'build_solver'):
+        # a SolverSpec, so build the solver in this process
+        solver = solver.build_solver()
+    if accumulator is None:
+        accumulator = ScoreAccumulator(len(adjacency))
+    for game in range(beg, end):
+        moves_per_apple = tester(adjacency, solver, find_game_seed(master_seed, game))
+        if moves_per_apple is None:
+            print('Failure: ' + solver.name)
+        accumulator.add_game(moves_per_apple)
+        if progress is not None:
+            progress(accumulator)
+    return accumulator
+
+def _play_games_in_worker(args):
+    # top level, so that it can be sent to a worker process
+    return play_games(*args)
+
+def run_multiple_games(adjacency, solver, N, tester = simulate_rejection_sampling, workers=None, seed=None, progress=None,
+                       checkpoint=None, checkpoint_interval=60, accumulator=None):
+    """
+    Plays N games, returns a ScoreAccumulator of scores and moves-per-apple.
+    ``progress(accumulator)`` is called as games finish if given.
+
+    With ``workers``, the games are split into contiguous chunks and played on a process pool.
+    Each game gets its own seed derived from ``seed``,
+    so the result does not depend on the number of workers.
+    The solver must be picklable to be sent to the workers, 
+    wrap it in a SolverSpec from GridSolvers.Templates to rebuild it in each worker instead.
+
+    With ``checkpoint``, a file path, the results so far are saved there every ``checkpoint_interval`` seconds,
+    on Ctrl-C and at the end. If the file exists, the run resumes from it, with the same seed,
+    and gives exactly the result of an uninterrupted run.
+
+    With ``accumulator``, the results of the first games played with the same seed, 
+    only the remaining games are played, and any checkpoint file is not read.
+    """
+    if accumulator is None:
+        accumulator = ScoreAccumulator(len(adjacency))
+        state = load_checkpoint(checkpoint) if checkpoint is not None else None
+    else:
+        state = None
+    if checkpoint is not None:
+        if state is None:
+            if seed is None:
+                # a resumed run must replay the same games
+                seed = Random().getrandbits(64)
+        else:
+            if state['name'] != solver.name:
+                raise ValueError(f"Checkpoint {checkpoint} is for {state['name']}, not {solver.name}")
+            if seed is not None and seed != state['seed']:
+                raise ValueError(f"Checkpoint {checkpoint} has seed {state['seed']}, not {seed}")
+            seed = state['seed']
+            accumulator = state['accumulator']
+            
+    if workers is not None and seed is None:
+        # workers would otherwise inherit the same random state
+        seed = Random().getrandbits(64)
+
+    last_save = time.time()
+    def save():
+        save_checkpoint(checkpoint, seed, accumulator, solver.name)
+    
+    def report(accumulator):
+        nonlocal last_save
+        if progress is not None:
+            progress(accumulator)
+        if checkpoint is not None and time.time() - last_save >= checkpoint_interval:
+            save()
+            last_save = time.time()
+
+    try:
+        if workers is None or workers <= 1:
+            play_games(adjacency, solver, seed, accumulator.num_games, N, tester, report, accumulator)
+        else:
+            # a few chunks per worker, so that slow chunks do not hold up the pool
+            beg = accumulator.num_games
+            num_games = max(N - beg, 0)
+            num_chunks = max(min(num_games, 4 * workers), 1)
+            bounds = [beg + num_games * k // num_chunks for k in range(num_chunks+1)]
+            chunks = [(adjacency, solver, seed, chunk_beg, chunk_end, tester)
+                      for chunk_beg, chunk_end in zip(bounds, bounds[1:])]
+
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                # map keeps the chunks in order, so the accumulator is always a whole number of games from the start
+                for chunk_accumulator in pool.map(_play_games_in_worker, chunks):
+                    accumulator.merge(chunk_accumulator)
+                    report(accumulator)
+    except KeyboardInterrupt:
+        if checkpoint is not None:
+            save()
+        raise
+
+    if checkpoint is not None:
+        save()
+    return accumulator
+
+def run_until_confident(adjacency, solver, target, max_games, max_time=None, batch_size=100, z=1.96,
+                        tester=simulate_rejection_sampling, workers=None, seed=None, progress=None, checkpoint=None):
+    """
+    Plays batches of games until the confidence interval of the mean score,
+    with half-width z standard errors, is within ``target`` of the mean, relative to it.
+    Stops early after ``max_games`` games or ``max_time`` seconds.
+    Returns the ScoreAccumulator, whose num_games is the number of games needed.
+    """
+    if checkpoint is not None and seed is None:
+        state = load_checkpoint(checkpoint)
+        if state is not None:
+            seed = state['seed']
+    if seed is None and (workers is not None or checkpoint is not None):
+        # every batch must continue the same sequence of games
+        seed = Random().getrandbits(64)
+
+    start_time = time.time()
+    accumulator = None
+    while True:
+        num_games = 0 if accumulator is None else accumulator.num_games
+        N = min(num_games + batch_size, max_games)
+        accumulator = run_multiple_games(adjacency, solver, N, tester, workers, seed, progress,
+                                         checkpoint, accumulator=accumulator)
+        if accumulator.find_relative_half_width(z) <= target:
+            break
+        if accumulator.num_games >= max_games:
+            break
+        if max_time is not None and time.time() - start_time >= max_time:
+            break
+    return accumulator
@@ -0,0 +1,99 @@
+"""
+Simulates many games of the Loop strategy at once with NumPy.
+A Loop snake always lies along its cycle, so the moves to each apple
+are found from the apple's index among the free cells ahead of the head,
+and games can be played in lockstep as arrays, one apple at a time.
+"""
+import time
+import numpy as np
+from Approximations.Loop import find_Loop_PDF
+from GridsAndGraphs.Adjacencies import find_adjacency_grid
+from GridSolvers.Loop import GridSolver_Loop
+from Tests.Simulation import ScoreAccumulator, run_multiple_games
+
+
+# ==== Batches of games ====
+
+def find_Loop_batch_moves_HC(rng, area, num_games):
+    # on a cycle, the k-th free cell ahead of the head is k+1 moves away
+    return rng.integers(1, np.arange(area-1, 0, -1), size=(num_games, area-1), dtype=np.int32, endpoint=True)
+
+def find_Loop_batch_moves_theta(rng, area, num_games):
+    # the lap has the holes at its last index, hole2 is taken only to eat an apple there
+    # so track each head's index, and whether hole2 was the last hole taken and is still in the snake
+    lap = area - 1
+    last = lap - 1
+    moves = np.empty((num_games, area-1), dtype=np.int32)
+
+    start = rng.integers(0, area, size=num_games)
+    index_head = np.minimum(start, last)
+    last_hole2 = start == lap
+    hole2_in_body = last_hole2.copy()
+    draws = rng.integers(0, np.arange(area-1, 0, -1), size=(num_games, area-1), dtype=np.int32)
+
+    for apples_eaten in range(area-1):
+        length = apples_eaten + 1
+        k = draws[:, apples_eaten]
+        to_holes = (last - index_head) % lap
+        to_holes[to_holes == 0] = lap
+        in_lap = k < lap - length
+        moves_this_apple = np.where(in_lap, k + 1, to_holes)
+        moves[:, apples_eaten] = moves_this_apple
+
+        index_apple = np.where(in_lap, (index_head + 1 + k) % lap, last)
+        eats_hole2 = ~in_lap & ~hole2_in_body
+        passes_holes = to_holes <= moves_this_apple
+        last_hole2 = np.where(passes_holes, (to_holes == moves_this_apple) & eats_hole2, last_hole2)
+        hole2_in_body = last_hole2 & ((index_apple - last) % lap <= length)
+        index_head = index_apple
+    return moves
+
+def run_Loop_batch(solver, N, seed=None, batch_size=1000, accumulator=None):
+    """
+    Plays N games of a GridSolver_Loop, returns a ScoreAccumulator as run_multiple_games does.
+    Games are played batch_size at a time, which takes memory of about 4*A*batch_size bytes.
+    """
+    cycle = solver.followed_cycle
+    area = cycle.lap + (cycle.hole2 is not None)
+    find_Loop_batch_moves = find_Loop_batch_moves_HC if cycle.hole2 is None else find_Loop_batch_moves_theta
+    if accumulator is None:
+        accumulator = ScoreAccumulator(area)
+    rng = np.random.default_rng(seed)
+    for beg in range(0, N, batch_size):
+        moves = find_Loop_batch_moves(rng, area, min(batch_size, N - beg))
+        scores = moves.sum(axis=1, dtype=np.int64)
+        accumulator.add_scores(scores.tolist(), moves.sum(axis=0, dtype=np.int64).tolist())
+    return accumulator
+
+
+# ==== Validation ====
+
+def validate_Loop_batch(m, n, N, seed=None):
+    """
+    Compares N batch games on an m x n grid with the exact distribution of Loop scores if the area is even,
+    otherwise with N games of the simulator.
+    """
+    area = m * n
+    solver = GridSolver_Loop(m, n)
+    last_time = time.time()
+    accumulator = run_Loop_batch(solver, N, seed)
+    print(f"Batch of {N} Loop games on {m}x{n} grid: mean {accumulator.mean():.3f}, "
+          f"std dev {accumulator.std():.3f}, time {time.time() - last_time:.3f}")
+
+    if area % 2 == 0:
+        # Kolmogorov-Smirnov distance, which is below 1.36/sqrt(N) 95% of the time
+        pdf = find_Loop_PDF(area)
+        exact_cdf = 0
+        batch_count = 0
+        distance = 0
+        for score, probability in enumerate(pdf):
+            exact_cdf += probability
+            batch_count += accumulator.score_counts.get(score, 0)
+            distance = max(distance, abs(batch_count/N - float(exact_cdf)))
+        print(f"KS distance from find_Loop_PDF: {distance:.5f}, 95% critical value {1.36/N**0.5:.5f}")
+    else:
+        simulated = run_multiple_games(find_adjacency_grid(m, n), solver, N, seed=seed)
+        standard_error = (accumulator.variance()/N + simulated.variance()/N) ** 0.5
+        print(f"Simulated mean {simulated.mean():.3f}, "
+              f"difference {(accumulator.mean() - simulated.mean())/standard_error:.2f} standard errors")
+    return accumulator
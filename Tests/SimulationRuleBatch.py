@@ -0,0 +1,176 @@
+"""
+Simulates many games at once with NumPy, for solvers which choose each move by a local rule,
+such as Drone's Rules.
+The solver gives its first and second choice of new head for a batch of games, as arrays,
+with a method find_choices_batch(heads, apples); the first is taken unless it runs into the snake.
+All unfinished games advance one move per step, with each snake kept as a row of a carved_path matrix.
+"""
+import numpy as np
+from Tests.Simulation import ScoreAccumulator
+
+
+# ==== Apples ====
+
+class RandomBuffer:
+    """
+    Uniform floats in [0, 1) drawn a million at a time,
+    as asking the generator for a few numbers on every step costs more than using them.
+    """
+    def __init__(self, rng, size=2**20):
+        self.rng = rng
+        self.size = size
+        self.floats = rng.random(size)
+        self.position = 0
+
+    def take(self, count):
+        if self.position + count > self.size:
+            self.floats = self.rng.random(max(self.size, count))
+            self.position = 0
+        floats = self.floats[self.position:self.position+count]
+        self.position += count
+        return floats
+
+def draw_free_cells_batch(randoms, carved_path, rows, heads, num_tries=8):
+    """
+    A uniformly random free cell for each of the given games.
+    Draws by rejection num_tries times, then counts the free cells of any games still without one.
+    """
+    num_games = len(rows)
+    area = carved_path.shape[1]
+    tries = (randoms.take(num_games * num_tries) * area).astype(np.int32).reshape(num_games, num_tries)
+    free = (carved_path[rows[:, None], tries] == -1) & (tries != heads[:, None])
+    first_free = free.argmax(axis=1)
+    cells = tries[np.arange(num_games), first_free]
+
+    rejected = np.flatnonzero(~free[np.arange(num_games), first_free])
+    if rejected.size:
+        free = carved_path[rows[rejected]] == -1
+        free[np.arange(len(rejected)), heads[rejected]] = False
+        k = (randoms.take(len(rejected)) * free.sum(axis=1)).astype(np.int32)
+        cells[rejected] = np.argmax(free.cumsum(axis=1) > k[:, None], axis=1)
+    return cells
+
+
+# ==== Choices ====
+
+def find_neighbours_array(adjacency):
+    # the neighbours of each cell as a row, padded with -1
+    neighbours = np.full((len(adjacency), max(len(x) for x in adjacency)), -1)
+    for cell, adjacent in enumerate(adjacency):
+        neighbours[cell, :len(adjacent)] = adjacent
+    return neighbours
+
+def find_choices_func(adjacency, solver, max_table_size=2**24):
+    """
+    Returns find_choices(heads, apples), giving the solver's first and second choices as arrays,
+    with -1 for a choice which is not adjacent to the head.
+    The choices for every head and apple are tabulated, in 4 bytes each, if there are at most max_table_size,
+    which saves working out the rules on every move.
+    """
+    area = len(adjacency)
+    neighbours = find_neighbours_array(adjacency)
+
+    def find_legal_choices(heads, apples):
+        choices = []
+        for choice in solver.find_choices_batch(heads, apples):
+            adjacent = (neighbours[heads] == choice[:, None]).any(axis=1)
+            choices.append(np.where(adjacent, choice, -1).astype(np.int32))
+        return choices
+
+    if area * area > max_table_size or area >= 2**15:
+        return find_legal_choices
+
+    # both choices packed into one int32, plus one so that -1 packs too
+    packed_choices = np.empty(area * area, dtype=np.int32)
+    apples = np.arange(area)
+    for head in range(area):
+        first, second = find_legal_choices(np.full(area, head), apples)
+        packed_choices[head*area:(head+1)*area] = (first + 1) | ((second + 1) << 16)
+
+    def find_tabulated_choices(heads, apples):
+        packed = packed_choices[heads * area + apples]
+        return (packed & 0xFFFF) - 1, (packed >> 16) - 1
+    return find_tabulated_choices
+
+
+# ==== Batches of games ====
+
+def play_rule_batch(adjacency, find_choices, num_games, randoms):
+    """
+    Plays num_games games in lockstep,
+    returns the moves taken for each apple of each game, and whether each game failed.
+    """
+    area = len(adjacency)
+    carved_path = np.full((num_games, area), -1, dtype=np.int16 if area < 2**15 else np.int32)
+    flat_carved_path = carved_path.reshape(-1)
+    moves_per_apple = np.zeros((num_games, area-1), dtype=np.int32)
+    failed = np.zeros(num_games, dtype=bool)
+
+    # the state of the unfinished games, whose rows of carved_path are in games
+    games = np.arange(num_games, dtype=np.int32)
+    offsets = games.astype(np.int64) * area
+    heads = (randoms.take(num_games) * area).astype(np.int32)
+    tails = heads.copy()
+    apples = draw_free_cells_batch(randoms, carved_path, games, heads)
+    apples_eaten = np.zeros(num_games, dtype=np.int32)
+    moves_this_apple = np.zeros(num_games, dtype=np.int32)
+
+    while games.size:
+        first, second = find_choices(heads, apples)
+        # an illegal first choice reads some other cell here, but fails the game if taken
+        first_free = (flat_carved_path[offsets + first] == -1) | (first == tails)
+        new_heads = np.where(first_free, first, second)
+
+        flat_carved_path[offsets + heads] = new_heads
+        heads = new_heads
+        moves_this_apple += 1
+
+        # snakes which did not eat move their tails
+        ate = new_heads == apples
+        tail_indices = offsets + tails
+        new_tails = flat_carved_path[tail_indices]
+        flat_carved_path[tail_indices] = np.where(ate, new_tails, -1)
+        tails = np.where(ate, tails, new_tails)
+        fails = (new_heads == -1) | (flat_carved_path[offsets + heads] != -1)
+
+        eaters = np.flatnonzero(ate & ~fails)
+        if eaters.size:
+            moves_per_apple[games[eaters], apples_eaten[eaters]] = moves_this_apple[eaters]
+            apples_eaten[eaters] += 1
+            moves_this_apple[eaters] = 0
+            eaters = eaters[apples_eaten[eaters] < area-1]
+            apples[eaters] = draw_free_cells_batch(randoms, carved_path, games[eaters], heads[eaters])
+
+        finished = fails | (apples_eaten == area-1)
+        if finished.any():
+            failed[games[fails]] = True
+            unfinished = ~finished
+            games = games[unfinished]
+            offsets = offsets[unfinished]
+            heads = heads[unfinished]
+            tails = tails[unfinished]
+            apples = apples[unfinished]
+            apples_eaten = apples_eaten[unfinished]
+            moves_this_apple = moves_this_apple[unfinished]
+
+    return moves_per_apple, failed
+
+def run_rule_batch(adjacency, solver, N, seed=None, batch_size=4000, accumulator=None):
+    """
+    Plays N games of a local rule solver, returns a ScoreAccumulator as run_multiple_games does.
+    Games are played batch_size at a time, which takes memory of about 6*A*batch_size bytes.
+    """
+    area = len(adjacency)
+    if accumulator is None:
+        accumulator = ScoreAccumulator(area)
+    randoms = RandomBuffer(np.random.default_rng(seed))
+    find_choices = find_choices_func(adjacency, solver)
+    for beg in range(0, N, batch_size):
+        moves_per_apple, failed = play_rule_batch(adjacency, find_choices, min(batch_size, N - beg), randoms)
+        for game in range(int(failed.sum())):
+            print('Failure: ' + solver.name)
+            accumulator.add_game(None)
+        moves_per_apple = moves_per_apple[~failed]
+        accumulator.add_scores(moves_per_apple.sum(axis=1, dtype=np.int64).tolist(),
+                               moves_per_apple.sum(axis=0, dtype=np.int64).tolist())
+    return accumulator